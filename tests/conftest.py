@@ -1,4 +1,7 @@
 import os
+import shutil
+
+import pytest
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
@@ -36,4 +39,22 @@ assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts'])
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
+    'tests.fixtures.fixture_perf',
 ]
+
+
+def pytest_configure(config):
+    """Как QueryBudgetRunner: кэши тестов во временном каталоге."""
+    from core.testing import isolate_caches
+    config.cache_directory = isolate_caches()
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(config.cache_directory, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True, scope='session')
+def query_budget_strict():
+    """Как QueryBudgetRunner: выход view за бюджет запросов — ошибка."""
+    from django.conf import settings
+    settings.QUERY_BUDGET_STRICT = True
@@ -0,0 +1,211 @@
+"""Замеры view на наборах данных разного размера.
+
+Тест получает perf_size (число постов) и perf_data — засеянную
+командой seed базу этого размера, одну на модуль и размер. Фикстура
+perf_bench выполняет view на холодном кэше и сверяет число запросов
+с бюджетом из urls.py. Число запросов не должно расти вместе
+с размером базы: лента отдает страницу, а не таблицу.
+
+С --perf фикстура еще и замеряет время нескольких повторов после
+прогрева, тоже с холодным кэшем, и проверяет, что медиана не растет
+с размером. Время зависит от машины, поэтому по умолчанию
+проверяется только число запросов.
+
+    pytest tests/test_perf.py --perf --perf-sizes 10,1k,100k \
+        --perf-json perf.json
+"""
+import json
+import statistics
+import time
+from collections import namedtuple
+
+import pytest
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db.models import Count
+from django.urls import resolve, reverse
+
+from core.loadtest import percentile
+from core.queries import record_queries
+from posts.management.commands.seed import count
+
+PerfData = namedtuple('PerfData', 'size group author post reader')
+
+# Во сколько раз медиана на большой базе может превышать медиану
+# на самой маленькой, и сколько миллисекунд шума прощается сверху.
+SCALING_SLACK_MS = 5
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('perf', 'замеры view')
+    group.addoption(
+        '--perf', action='store_true',
+        help='Замерять время view и проверять его рост с размером базы.'
+    )
+    group.addoption(
+        '--perf-sizes', default='10,1k',
+        help='Размеры базы в постах через запятую, например 10,1k,100k.'
+    )
+    group.addoption('--perf-rounds', type=int, default=5)
+    group.addoption('--perf-warmup', type=int, default=2)
+    group.addoption(
+        '--perf-scaling', type=float, default=3.0,
+        help='Допустимый рост медианы времени относительно меньшей базы.'
+    )
+    group.addoption(
+        '--perf-json', metavar='PATH',
+        help='Записать результаты замеров в JSON.'
+    )
+
+
+def pytest_configure(config):
+    config.perf_results = []
+
+
+def pytest_generate_tests(metafunc):
+    if 'perf_size' in metafunc.fixturenames:
+        sizes = sorted(
+            count(value)
+            for value in metafunc.config.getoption('perf_sizes').split(',')
+        )
+        metafunc.parametrize(
+            'perf_size', sizes, scope='module',
+            ids=[f'{size}posts' for size in sizes],
+        )
+
+
+def pytest_sessionfinish(session):
+    path = session.config.getoption('perf_json', None)
+    results = getattr(session.config, 'perf_results', None)
+    if not path or not results:
+        return
+    with open(path, 'w', encoding='utf-8') as results_file:
+        json.dump(
+            {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'rounds': session.config.getoption('perf_rounds'),
+                'warmup': session.config.getoption('perf_warmup'),
+                'results': results,
+            },
+            results_file, ensure_ascii=False, indent=2,
+        )
+
+
+def clear_caches():
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+def time_view(client, url, config):
+    """Время ответа view в миллисекундах после прогрева."""
+    # Повторы тоже на холодном кэше: важна работа с базой,
+    # ответ из кэша одинаково быстр при любом размере.
+    for _ in range(config.getoption('perf_warmup')):
+        clear_caches()
+        client.get(url)
+    timings = []
+    for _ in range(config.getoption('perf_rounds')):
+        clear_caches()
+        started = time.perf_counter()
+        client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'max_ms': round(timings[-1], 3),
+    }
+
+
+@pytest.fixture(scope='module')
+def perf_data(perf_size, django_db_setup, django_db_blocker):
+    """База из perf_size постов; после модуля очищается."""
+    from posts.models import Follow, Post
+
+    with django_db_blocker.unblock():
+        call_command(
+            'seed', '--users', '50', '--groups', '5',
+            '--posts', str(perf_size), '--follows', '300',
+            '--comments', str(perf_size // 2), '--seed', '1',
+            '--batch-size', '5000', verbosity=0,
+        )
+        post = Post.objects.select_related('author', 'group').filter(
+            group__isnull=False
+        ).order_by('-pk').first() or Post.objects.order_by('-pk').first()
+        reader = Follow.objects.values('user').annotate(
+            follows=Count('author')
+        ).order_by('-follows').first()
+        yield PerfData(
+            perf_size, post.group, post.author, post, reader['user']
+        )
+        call_command('flush', interactive=False, verbosity=0)
+        clear_caches()
+
+
+@pytest.fixture
+def perf_bench(request, client, db):
+    """bench(name, *args, user=None, query=''): замер view по имени URL."""
+    config = request.config
+
+    def bench(name, *args, user=None, query=''):
+        size = request.getfixturevalue('perf_size')
+        if user is not None:
+            client.force_login(user)
+        view_budget = resolve(reverse(name, args=args)).func.query_budget
+        url = reverse(name, args=args) + query
+
+        clear_caches()
+        with record_queries() as log:
+            response = client.get(url)
+        assert response.status_code == 200, (
+            f'{name} ответил {response.status_code}'
+        )
+        assert log.count <= view_budget.queries, (
+            f'{name} на {size} постах: {log.count} запросов '
+            f'при бюджете {view_budget.queries}'
+        )
+        assert not log.duplicates(), (
+            f'{name} на {size} постах повторяет запросы: '
+            + '; '.join(log.problems())
+        )
+
+        result = {
+            'view': name,
+            'size': size,
+            'queries': log.count,
+            'budget': view_budget.queries,
+            'query_ms': round(log.time, 3),
+        }
+        timed = config.getoption('perf')
+        if timed:
+            result.update(time_view(client, url, config))
+
+        smallest = next(
+            (
+                earlier for earlier in config.perf_results
+                if earlier['view'] == name
+            ),
+            None,
+        )
+        config.perf_results.append(result)
+        if smallest is None:
+            return result
+        assert result['queries'] <= smallest['queries'], (
+            f'{name}: {result["queries"]} запросов на {size} постах, '
+            f'{smallest["queries"]} на {smallest["size"]}'
+        )
+        if not timed:
+            return result
+        limit = (
+            smallest['median_ms'] * config.getoption('perf_scaling')
+            + SCALING_SLACK_MS
+        )
+        assert result['median_ms'] <= limit, (
+            f'{name}: медиана {result["median_ms"]} мс на {size} постах, '
+            f'{smallest["median_ms"]} мс на {smallest["size"]}'
+        )
+        return result
+
+    return bench
@@ -0,0 +1,28 @@
+import pytest
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestViewPerformance:
+
+    def test_index(self, perf_bench, perf_data):
+        perf_bench('posts:index')
+
+    def test_group_posts(self, perf_bench, perf_data):
+        perf_bench('posts:group_list', perf_data.group.slug)
+
+    def test_profile(self, perf_bench, perf_data):
+        perf_bench('posts:profile', perf_data.author.username)
+
+    def test_post_detail(self, perf_bench, perf_data):
+        perf_bench('posts:post_detail', perf_data.post.pk)
+
+    def test_follow_index(self, perf_bench, perf_data, django_user_model):
+        reader = django_user_model.objects.get(pk=perf_data.reader)
+        perf_bench('posts:follow_index', user=reader)
+
+    def test_search(self, perf_bench, perf_data):
+        # Редкие слова: ранжирование по релевантности растет с числом
+        # совпадений, а не с размером базы.
+        words = sorted(perf_data.post.text.strip('.').split(), key=len)
+        perf_bench('posts:search', query=f'?q={" ".join(words[-3:])}')
@@ -0,0 +1,31 @@
+from django.contrib import admin
+
+from . import jobs
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'priority',
+        'attempts',
+        'run_at',
+        'started_at',
+        'finished_at',
+        'locked_by',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('created', 'started_at', 'finished_at', 'locked_by')
+    empty_value_display = '-пусто-'
+
+    def changelist_view(self, request, extra_context=None):
+        """Над списком задач показывает глубину очереди и задержки."""
+        extra_context = extra_context or {}
+        extra_context['queue_stats'] = jobs.stats()
+        return super().changelist_view(request, extra_context)
+
+
+admin.site.register(Job, JobAdmin)
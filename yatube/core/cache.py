@@ -0,0 +1,297 @@
+"""Общий для всех процессов кэш в файле SQLite в режиме WAL.
+
+LocMemCache у каждого процесса свой: холодный после старта,
+с собственной копией каждого фрагмента и без чужих инвалидаций.
+Этот бэкенд хранит записи в одном файле, поэтому процессы
+одного сервера видят общий кэш и общие счетчики поколений.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        size INTEGER NOT NULL
+    ) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache(expires)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_hits ON cache(hits, accessed)',
+)
+# Порядок вытеснения для политик, когда просроченных записей не хватило.
+POLICIES = {
+    'lru': 'accessed',
+    'lfu': 'hits, accessed',
+}
+# Обращения копятся в памяти и пишутся одной пачкой,
+# чтобы чтение не превращалось в запись на каждый get.
+TOUCH_BATCH = 100
+TOUCH_INTERVAL = 1.0
+# Как часто, в записях, проверять размер кэша.
+CULL_EVERY = 50
+
+
+def dump(value):
+    # Целые лежат в колонке как INTEGER, чтобы incr шел одним UPDATE.
+    if type(value) is int:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def load(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле LOCATION.
+
+    OPTIONS:
+        MAX_ENTRIES, CULL_FREQUENCY — как у встроенных бэкендов;
+        MAX_BYTES — предел суммарного размера значений;
+        POLICY — 'lru' или 'lfu', кого вытеснять после просроченных.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_bytes = options.get('MAX_BYTES')
+        policy = options.get('POLICY', 'lru').lower()
+        if policy not in POLICIES:
+            raise ValueError(f'Неизвестная политика вытеснения: {policy}')
+        self.eviction_order = POLICIES[policy]
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        """Соединение своего потока; после fork открывается заново."""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection = connection
+            local.pid = os.getpid()
+            local.touched = {}
+            local.flushed = time.time()
+            local.writes = 0
+        return local.connection
+
+    def write(self, statements):
+        """Выполняет запросы одной транзакцией с блокировкой на запись."""
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rowcounts = [
+                connection.execute(sql, params).rowcount
+                for sql, params in statements
+            ]
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._local.writes += 1
+        if self._local.writes % CULL_EVERY == 0:
+            self._cull()
+        return rowcounts
+
+    def _touch(self, keys):
+        now = time.time()
+        touched = self._local.touched
+        for key in keys:
+            touched[key] = touched.get(key, 0) + 1
+        if (
+            len(touched) >= TOUCH_BATCH
+            or now - self._local.flushed >= TOUCH_INTERVAL
+        ):
+            self.flush_touches()
+
+    def flush_touches(self):
+        """Записывает накопленные обращения для LRU/LFU."""
+        connection = self.connection
+        touched, self._local.touched = self._local.touched, {}
+        self._local.flushed = time.time()
+        if not touched:
+            return
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'UPDATE cache SET accessed = ?, hits = hits + ? '
+                'WHERE key = ?',
+                [(self._local.flushed, hits, key)
+                 for key, hits in touched.items()],
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def _fetch(self, keys):
+        placeholders = ', '.join('?' * len(keys))
+        rows = self.connection.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) '
+            'AND (expires IS NULL OR expires > ?)',
+            [*keys, time.time()],
+        ).fetchall()
+        if rows:
+            self._touch(key for key, _ in rows)
+        return {key: load(value) for key, value in rows}
+
+    def _row(self, key, value, timeout):
+        data = dump(value)
+        size = len(data) if isinstance(data, bytes) else 8
+        return (
+            'INSERT OR REPLACE INTO cache '
+            '(key, value, expires, accessed, hits, size) '
+            'VALUES (?, ?, ?, ?, 0, ?)',
+            (key, data, self.get_backend_timeout(timeout), time.time(), size),
+        )
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        found = {}
+        names = list(keys)
+        # Держимся ниже лимита SQLite на число параметров.
+        for start in range(0, len(names), 500):
+            found.update(self._fetch(names[start:start + 500]))
+        return {keys[key]: value for key, value in found.items()}
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self.connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.write([self._row(self._key(key, version), value, timeout)])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self.write([
+            self._row(self._key(key, version), value, timeout)
+            for key, value in data.items()
+        ])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        sql, params = self._row(key, value, timeout)
+        rowcounts = self.write([
+            (
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            ),
+            (sql.replace('OR REPLACE', 'OR IGNORE'), params),
+        ])
+        return rowcounts[-1] == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        rowcounts = self.write([(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )])
+        return rowcounts[0] == 1
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарное увеличение одним UPDATE под блокировкой на запись."""
+        key = self._key(key, version)
+        connection = self.connection
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            updated = connection.execute(
+                "UPDATE cache SET value = value + ? WHERE key = ? "
+                "AND typeof(value) = 'integer' "
+                "AND (expires IS NULL OR expires > ?)",
+                (delta, key, now),
+            ).rowcount
+            # Просроченная запись считается отсутствующей.
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, now),
+            ).fetchone()
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        if not updated:
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            # Не целое, например bool: инкремент как у LocMemCache.
+            value = load(row[0]) + delta
+            self.set(key, value, version=version)
+            return value
+        return row[0]
+
+    def delete(self, key, version=None):
+        self.write([
+            ('DELETE FROM cache WHERE key = ?', (self._key(key, version),))
+        ])
+
+    def delete_many(self, keys, version=None):
+        self.write([
+            ('DELETE FROM cache WHERE key = ?', (self._key(key, version),))
+            for key in keys
+        ])
+
+    def clear(self):
+        self.connection
+        self._local.touched = {}
+        self.write([('DELETE FROM cache', ())])
+
+    def _cull(self):
+        """Удаляет просроченные записи, а при переполнении —
+        1/CULL_FREQUENCY записей по политике вытеснения.
+        """
+        self.flush_touches()
+        connection = self.connection
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count, size = connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache'
+        ).fetchone()
+        if count <= self._max_entries and (
+            not self.max_bytes or size <= self.max_bytes
+        ):
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            f'ORDER BY {self.eviction_order} LIMIT ?)',
+            (max(count // self._cull_frequency, 1),),
+        )
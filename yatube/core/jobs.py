@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from functools import partial
+from statistics import mean
+
+from django.db import connection, connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import Job
+from yatube.settings import (JOB_KEEP_DONE, JOB_POLL_INTERVAL,
+                             JOB_RETRY_DELAY, JOB_TIMEOUT)
+
+# Сколько готовых задач перебирать, если соседний обработчик
+# успел забрать первую.
+CLAIM_CANDIDATES = 10
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(func):
+    """Регистрирует функцию как задачу.
+
+    func.delay(*args, priority=..., run_at=...) ставит ее в очередь.
+    Аргументы должны сериализоваться в JSON.
+    """
+    name = f'{func.__module__}.{func.__name__}'
+    TASKS[name] = func
+    func.delay = partial(enqueue, name)
+    return func
+
+
+def enqueue(name, *args, priority=0, run_at=None, max_attempts=3):
+    """Добавляет задачу в очередь.
+
+    Строка пишется в текущей транзакции, поэтому обработчик увидит
+    задачу только вместе с данными, ради которых ее поставили.
+    """
+    return Job.objects.create(
+        name=name,
+        args=json.dumps(args),
+        priority=priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def resolve(name):
+    if name not in TASKS:
+        # Модуль задачи регистрирует ее при импорте.
+        import_string(name)
+    if name not in TASKS:
+        raise LookupError(f'{name} не зарегистрирована как задача')
+    return TASKS[name]
+
+
+def worker_name(index=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def claim(worker):
+    """Забирает самую срочную готовую задачу или возвращает None.
+
+    Где есть SELECT ... FOR UPDATE SKIP LOCKED, строка блокируется им.
+    В SQLite его нет, и кандидата захватывает условный
+    UPDATE ... WHERE status = 'queued': задача достается тому,
+    у кого обновилась строка.
+    """
+    now = timezone.now()
+    ready = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=now
+    ).order_by('-priority', 'run_at', 'pk')
+    running = {
+        'status': Job.RUNNING,
+        'locked_by': worker,
+        'started_at': now,
+        'attempts': F('attempts') + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pk = ready.select_for_update(skip_locked=True).values_list(
+                'pk', flat=True
+            ).first()
+            if pk is None:
+                return None
+            Job.objects.filter(pk=pk).update(**running)
+            return Job.objects.get(pk=pk)
+    for pk in ready.values_list('pk', flat=True)[:CLAIM_CANDIDATES]:
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(**running):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def perform(job):
+    """Выполняет захваченную задачу и записывает результат."""
+    try:
+        resolve(job.name)(*json.loads(job.args))
+    except Exception:
+        logger.exception('job %s failed', job)
+        retry_or_fail(job, traceback.format_exc())
+        return False
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE, finished_at=timezone.now(), last_error=''
+    )
+    return True
+
+
+def retry_or_fail(job, error):
+    """Возвращает задачу в очередь с экспоненциальной задержкой,
+    пока не кончатся попытки.
+    """
+    now = timezone.now()
+    if job.attempts >= job.max_attempts:
+        changes = {'status': Job.FAILED, 'finished_at': now}
+    else:
+        delay = JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        changes = {
+            'status': Job.QUEUED,
+            'run_at': now + timedelta(seconds=delay),
+        }
+    Job.objects.filter(pk=job.pk).update(
+        locked_by='', last_error=error, **changes
+    )
+
+
+def housekeeping():
+    """Возвращает в очередь задачи упавших обработчиков
+    и удаляет старые выполненные.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        started_at__lt=now - timedelta(seconds=JOB_TIMEOUT),
+    )
+    for job in stale:
+        retry_or_fail(job, 'Обработчик не завершил задачу вовремя')
+    Job.objects.filter(
+        status=Job.DONE,
+        finished_at__lt=now - timedelta(seconds=JOB_KEEP_DONE),
+    ).delete()
+
+
+def before_fork():
+    """Закрывает соединения с базой перед запуском дочерних процессов.
+
+    Иначе процессы унаследуют открытое соединение SQLite родителя
+    и будут работать с базой через один и тот же дескриптор.
+    """
+    connections.close_all()
+
+
+def work(worker, stop=None, burst=False):
+    """Цикл обработчика: берет задачи, пока не выставят stop.
+
+    С burst=True выходит, как только очередь опустела.
+    """
+    stop = stop or threading.Event()
+    try:
+        while not stop.is_set():
+            job = claim(worker)
+            if job is not None:
+                perform(job)
+            elif burst:
+                break
+            else:
+                stop.wait(JOB_POLL_INTERVAL)
+    finally:
+        connections.close_all()
+
+
+def stats():
+    """Глубина очереди и задержки для админки."""
+    now = timezone.now()
+    counts = dict(
+        Job.objects.order_by().values_list('status').annotate(Count('pk'))
+    )
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+    oldest = ready.order_by('run_at').values_list('run_at', flat=True)
+    oldest = oldest.first()
+    started = Job.objects.filter(started_at__isnull=False).order_by(
+        '-started_at'
+    ).values_list('run_at', 'started_at')[:100]
+    waits = [(start - due).total_seconds() for due, start in started]
+    ready_count = ready.count()
+    return {
+        'ready': ready_count,
+        'scheduled': counts.get(Job.QUEUED, 0) - ready_count,
+        'running': counts.get(Job.RUNNING, 0),
+        'done': counts.get(Job.DONE, 0),
+        'failed': counts.get(Job.FAILED, 0),
+        'oldest_wait': (now - oldest).total_seconds() if oldest else 0,
+        'mean_wait': mean(waits) if waits else 0,
+        'max_wait': max(waits, default=0),
+    }
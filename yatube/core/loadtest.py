@@ -0,0 +1,212 @@
+"""Нагрузочные прогоны: клиенты, замеры и сравнение с эталоном.
+
+Сценарии ходят через драйвер: WSGIDriver вызывает
+yatube.wsgi.application в том же процессе, HTTPDriver — запущенный
+сервер по адресу. Каждый запрос замеряется под именем URL
+(posts:index, posts:post_detail...), а сводка сравнивается
+с сохраненным в JSON эталоном.
+"""
+import json
+import logging
+import time
+from collections import defaultdict
+
+import requests
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY)
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from core.routers import STICKY_COOKIE
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+# Адрес не из INTERNAL_IPS, чтобы debug toolbar не встраивался в ответы.
+CLIENT_ADDR = '192.0.2.1'
+
+
+def login_cookies(user):
+    """Cookie клиента с уже выполненным входом user.
+
+    Сессия только что записана, поэтому, как после настоящего входа,
+    чтение держится на основной базе, пока реплики ее не получат.
+    """
+    engine = import_string(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return {
+        settings.SESSION_COOKIE_NAME: session.session_key,
+        STICKY_COOKIE: repr(time.time()),
+    }
+
+
+class Recorder:
+    """Длительности запросов по имени URL, общие для потоков процесса."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name, seconds, ok):
+        # list.append под GIL атомарен, блокировка не нужна.
+        self.samples[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+    def merge(self, other):
+        for name, samples in other.samples.items():
+            self.samples[name].extend(samples)
+        for name, errors in other.errors.items():
+            self.errors[name] += errors
+
+
+class Driver:
+    """Общая часть клиентов: имя URL, замер, проверка статуса.
+
+    files — {поле: (имя файла, байты, content type)}. expect — статус
+    успешного ответа: отказ CSRF, например, отвечает 200, а форма
+    с ошибками — 200 вместо редиректа.
+    """
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def request(self, method, name, args=(), data=None, files=None,
+                query='', expect=None):
+        path = reverse(name, args=args) + query
+        start = time.perf_counter()
+        try:
+            status, body = self.send(method, path, data, files)
+        except Exception:
+            # Упавший запрос — ошибка прогона, а не конец сценариев:
+            # тестовый клиент пробрасывает исключения view, requests —
+            # сетевые ошибки.
+            logger.exception('%s %s', method.upper(), path)
+            status, body = 500, b''
+        ok = status < 400 if expect is None else status == expect
+        self.recorder.add(name, time.perf_counter() - start, ok)
+        return status, body
+
+    def get(self, name, *args, query='', expect=None):
+        return self.request('get', name, args, query=query, expect=expect)
+
+    def post(self, name, *args, data=None, files=None, expect=None):
+        return self.request('post', name, args, data, files, expect=expect)
+
+
+class WSGIDriver(Driver):
+    """Запросы прямо в WSGI-приложение проекта, без сети."""
+
+    def __init__(self, recorder, application, user=None):
+        super().__init__(recorder)
+        self.client = Client(REMOTE_ADDR=CLIENT_ADDR)
+        self.client.handler = lambda environ: application(
+            environ, lambda status, headers: None
+        )
+        if user is not None:
+            for name, value in login_cookies(user).items():
+                self.client.cookies[name] = value
+
+    def send(self, method, path, data, files):
+        headers = {}
+        token = self.client.cookies.get(settings.CSRF_COOKIE_NAME)
+        if method == 'post' and token is not None:
+            headers['HTTP_X_CSRFTOKEN'] = token.value
+        payload = dict(data or {})
+        for field, (name, content, content_type) in (files or {}).items():
+            payload[field] = SimpleUploadedFile(name, content, content_type)
+        response = getattr(self.client, method)(path, payload, **headers)
+        body = b''.join(response) if response.streaming else response.content
+        # Как сервер после отправки: сигнал request_finished
+        # закрывает соединения с базой.
+        response.close()
+        return response.status_code, body
+
+
+class HTTPDriver(Driver):
+    """Запросы к запущенному серверу по base_url."""
+
+    def __init__(self, recorder, base_url, user=None):
+        super().__init__(recorder)
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        if user is not None:
+            for name, value in login_cookies(user).items():
+                self.session.cookies.set(name, value)
+
+    def send(self, method, path, data, files):
+        headers = {}
+        token = self.session.cookies.get(settings.CSRF_COOKIE_NAME)
+        if method == 'post' and token is not None:
+            headers['X-CSRFToken'] = token
+        response = self.session.request(
+            method, self.base_url + path, data=data, files=files,
+            headers=headers, allow_redirects=False,
+        )
+        return response.status_code, response.content
+
+
+def percentile(ordered, percent):
+    """Процентиль по рангу из отсортированного списка."""
+    if not ordered:
+        return 0
+    rank = max(int(round(percent / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(recorder, elapsed):
+    """{имя URL: count, errors, rps и процентили в миллисекундах}."""
+    summary = {}
+    for name, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        row = {
+            'count': len(ordered),
+            'errors': recorder.errors.get(name, 0),
+            'rps': round(len(ordered) / elapsed, 2) if elapsed else 0,
+        }
+        for value in PERCENTILES:
+            row[f'p{value}'] = round(percentile(ordered, value) * 1000, 2)
+        summary[name] = row
+    return summary
+
+
+def regressions(summary, baseline, threshold):
+    """Строки с ухудшением против эталона больше чем на threshold.
+
+    Сравниваются p95 и пропускная способность по каждому URL,
+    который есть в обоих прогонах.
+    """
+    found = []
+    for name, row in summary.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if base['p95'] and row['p95'] > base['p95'] * (1 + threshold):
+            found.append(
+                f'{name}: p95 {row["p95"]} мс против {base["p95"]} мс'
+            )
+        if base['rps'] and row['rps'] < base['rps'] * (1 - threshold):
+            found.append(
+                f'{name}: {row["rps"]} запросов/с против {base["rps"]}'
+            )
+    return found
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as baseline_file:
+        return json.load(baseline_file)['urls']
+
+
+def save_baseline(path, summary, meta):
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump(
+            {'meta': meta, 'urls': summary}, baseline_file,
+            ensure_ascii=False, indent=2, sort_keys=True,
+        )
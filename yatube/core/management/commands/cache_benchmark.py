@@ -0,0 +1,70 @@
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+
+def bench_set(cache, ops):
+    for i in range(ops):
+        cache.set(f'key:{i}', f'<article>пост {i}</article>' * 20)
+
+
+def bench_get(cache, ops):
+    for i in range(ops):
+        cache.get(f'key:{i}')
+
+
+def bench_get_many(cache, ops):
+    for i in range(0, ops, 10):
+        cache.get_many([f'key:{j}' for j in range(i, i + 10)])
+
+
+def bench_incr(cache, ops):
+    cache.set('counter', 0, None)
+    for _ in range(ops):
+        cache.incr('counter')
+
+
+BENCHMARKS = (
+    ('set', bench_set),
+    ('get', bench_get),
+    ('get_many(10)', bench_get_many),
+    ('incr', bench_incr),
+)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость SQLiteCache и LocMemCache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ops', type=int, default=10000,
+            help='Число операций в каждом замере.'
+        )
+
+    def handle(self, *args, **options):
+        ops = options['ops']
+        with tempfile.TemporaryDirectory() as directory:
+            params = {'OPTIONS': {'MAX_ENTRIES': ops * 2}}
+            backends = (
+                ('LocMemCache', LocMemCache('benchmark', params)),
+                ('SQLiteCache', SQLiteCache(
+                    os.path.join(directory, 'cache.sqlite3'), params
+                )),
+            )
+            self.stdout.write(
+                f'{"операция":<14}'
+                + ''.join(f'{name:>16}' for name, _ in backends)
+            )
+            for title, bench in BENCHMARKS:
+                row = f'{title:<14}'
+                for _, cache in backends:
+                    started = time.perf_counter()
+                    bench(cache, ops)
+                    rate = ops / (time.perf_counter() - started)
+                    row += f'{rate:>12.0f} оп/с'
+                self.stdout.write(row)
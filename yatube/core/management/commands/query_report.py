@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from core.queries import DATABASE_STATS, get_stats, reset_stats
+
+
+def view_budgets(patterns=None, namespace=''):
+    """{имя view: бюджет или None} по всем URL проекта."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    budgets = {}
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = (
+                f'{namespace}{pattern.namespace}:'
+                if pattern.namespace else namespace
+            )
+            budgets.update(view_budgets(pattern.url_patterns, prefix))
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            budgets[f'{namespace}{pattern.name}'] = getattr(
+                pattern.callback, 'query_budget', None
+            )
+    return budgets
+
+
+class Command(BaseCommand):
+    help = 'Сводка запросов к базе по view и превышений их бюджетов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить накопленную сводку.'
+        )
+
+    def handle(self, *args, **options):
+        budgets = view_budgets()
+        databases = {
+            DATABASE_STATS.format(alias): alias for alias in settings.DATABASES
+        }
+        if options['reset']:
+            reset_stats([*budgets, *databases])
+            self.stdout.write(self.style.SUCCESS('Сводка обнулена'))
+            return
+        stats = get_stats(budgets)
+        self.stdout.write(
+            f'{"view":<32}{"запросов":>10}{"в среднем":>11}{"бюджет":>8}'
+            f'{"мс":>8}{"сверх":>7}{"повторы":>9}'
+        )
+        rows = sorted(
+            stats.items(), key=lambda item: item[1]['time_us'], reverse=True
+        )
+        for name, row in rows:
+            requests = row['requests'] or 1
+            budget = budgets.get(name)
+            limit = budget.queries if budget and budget.queries else '-'
+            self.stdout.write(
+                f'{name:<32}{row["requests"]:>10}'
+                f'{row["queries"] / requests:>11.1f}{limit:>8}'
+                f'{row["time_us"] / requests / 1000:>8.1f}'
+                f'{row["over_budget"]:>7}{row["duplicates"]:>9}'
+            )
+        self.stdout.write('')
+        self.stdout.write(f'{"база":<32}{"запросов":>10}{"мс":>11}')
+        for name, row in get_stats(databases).items():
+            self.stdout.write(
+                f'{databases[name]:<32}{row["queries"]:>10}'
+                f'{row["time_us"] / 1000:>11.1f}'
+            )
@@ -0,0 +1,70 @@
+import multiprocessing
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+from yatube.settings import JOB_TIMEOUT
+
+
+def run_threads(threads, burst):
+    """Запускает потоки-обработчики и периодически чистит очередь."""
+    stop = threading.Event()
+    workers = [
+        threading.Thread(
+            target=jobs.work,
+            args=(jobs.worker_name(index), stop, burst),
+            name=f'worker-{index}',
+        )
+        for index in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        while any(worker.is_alive() for worker in workers):
+            jobs.housekeeping()
+            connections.close_all()
+            for worker in workers:
+                worker.join(JOB_TIMEOUT / 10)
+    except KeyboardInterrupt:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает фоновые задачи из очереди в БД.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Число потоков в каждом процессе.'
+        )
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Число процессов-обработчиков.'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выйти, когда очередь опустеет.'
+        )
+
+    def handle(self, *args, **options):
+        threads, burst = options['threads'], options['burst']
+        if options['processes'] == 1:
+            run_threads(threads, burst)
+            return
+        jobs.before_fork()
+        processes = [
+            multiprocessing.Process(target=run_threads, args=(threads, burst))
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.join()
@@ -0,0 +1,135 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from core.loadtest import percentile
+from core.sqlite.gate import gate_stats
+from core.sqlite.transaction import atomic_write
+
+# Встроенный бэкенд против core.sqlite с SQLITE_PRAGMAS и очередью записи.
+CONFIGS = (
+    ('как есть', {'ENGINE': 'django.db.backends.sqlite3'}),
+    ('настроено', {}),
+)
+SCHEMA = (
+    'CREATE TABLE bench (id INTEGER PRIMARY KEY, author INTEGER, '
+    'text TEXT)',
+    'CREATE INDEX bench_author ON bench(author)',
+)
+
+
+def writer(alias, number, deadline, result):
+    """Как add_comment: чтение и запись в одной транзакции."""
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            with atomic_write(using=alias):
+                cursor = connections[alias].cursor()
+                cursor.execute(
+                    'SELECT count(*) FROM bench WHERE author = %s', [number]
+                )
+                cursor.execute(
+                    'INSERT INTO bench (author, text) VALUES (%s, %s)',
+                    [number, 'комментарий' * 20],
+                )
+        except OperationalError as error:
+            result['errors'].append(str(error))
+            continue
+        result['writes'].append(time.perf_counter() - started)
+    connections[alias].close()
+
+
+def reader(alias, number, deadline, result):
+    """Как лента: последние записи без транзакции."""
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            cursor = connections[alias].cursor()
+            cursor.execute(
+                'SELECT id, author, text FROM bench ORDER BY id DESC LIMIT 10'
+            )
+            cursor.fetchall()
+        except OperationalError as error:
+            result['errors'].append(str(error))
+            continue
+        result['reads'].append(time.perf_counter() - started)
+    connections[alias].close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Гоняет параллельных писателей и читателей по временной базе '
+        'SQLite: настройки по умолчанию против SQLITE_PRAGMAS и очереди '
+        'записи.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Секунд на каждую конфигурацию.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"":<12}{"записей/с":>11}{"p95 записи":>12}'
+            f'{"чтений/с":>11}{"p95 чтения":>12}{"ошибок":>8}'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for index, (title, extra) in enumerate(CONFIGS):
+                path = os.path.join(directory, f'bench{index}.sqlite3')
+                result = self.run(path, extra, options)
+                self.stdout.write(
+                    f'{title:<12}'
+                    f'{len(result["writes"]) / options["duration"]:>11.0f}'
+                    f'{percentile(result["writes"], 95) * 1000:>9.1f} мс'
+                    f'{len(result["reads"]) / options["duration"]:>11.0f}'
+                    f'{percentile(result["reads"], 95) * 1000:>9.1f} мс'
+                    f'{len(result["errors"]):>8}'
+                )
+                gate = gate_stats().get(path)
+                if gate:
+                    self.stdout.write(
+                        f'{"":<12}очередь записи: {gate["contended"]} '
+                        f'из {gate["acquired"]} ждали, '
+                        f'всего {gate["wait_ms"]:.0f} мс, '
+                        f'максимум {gate["wait_max_ms"]:.1f} мс, '
+                        f'таймаутов {gate["timeouts"]}'
+                    )
+
+    def run(self, path, extra, options):
+        alias = f'sqlite_bench_{os.path.basename(path)}'
+        connections.databases[alias] = dict(
+            settings.DATABASES['default'], NAME=path, **extra
+        )
+        try:
+            with connections[alias].cursor() as cursor:
+                for statement in SCHEMA:
+                    cursor.execute(statement)
+            connections[alias].close()
+            result = {'writes': [], 'reads': [], 'errors': []}
+            deadline = time.monotonic() + options['duration']
+            threads = [
+                threading.Thread(
+                    target=target, args=(alias, number, deadline, result)
+                )
+                for target, count in (
+                    (writer, options['writers']), (reader, options['readers'])
+                )
+                for number in range(count)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            result['writes'].sort()
+            result['reads'].sort()
+            return result
+        finally:
+            del connections.databases[alias]
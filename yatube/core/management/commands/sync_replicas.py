@@ -0,0 +1,55 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from core.models import Heartbeat
+from core.routers import HEARTBEAT
+from yatube.settings import DATABASE_REPLICAS
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики из DATABASE_REPLICAS '
+        'и ставит отметку, по которой считается их отставание.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые столько секунд (0 — один раз).'
+        )
+
+    def handle(self, *args, **options):
+        if not DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: REPLICA_COUNT = 0.')
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError(
+                'Копировать файлом можно только SQLite, другие базы '
+                'реплицируются своими средствами.'
+            )
+        while True:
+            self.sync()
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def sync(self):
+        Heartbeat.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+            name=HEARTBEAT, defaults={'beat': timezone.now()}
+        )
+        source = connections[DEFAULT_DB_ALIAS]
+        source.ensure_connection()
+        for alias in DATABASE_REPLICAS:
+            started = time.perf_counter()
+            target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(
+                f'{alias}: {(time.perf_counter() - started) * 1000:.0f} мс'
+            )
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Heartbeat',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Название')),
+                ('beat', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Отметка')),
+            ],
+            options={
+                'verbose_name': 'Отметка репликации',
+                'verbose_name_plural': 'Отметки репликации',
+            },
+        ),
+    ]
@@ -0,0 +1,234 @@
+"""Учет запросов к базе по view: число, время и повторы.
+
+Бюджет view объявляется рядом с URL:
+
+    path('', budget(views.index, queries=6, time=50), name='index')
+
+QueryBudgetMiddleware записывает все запросы обработки, сверяет
+их с бюджетом и ищет одинаковый SQL, выполненный много раз, —
+обычно это N+1 из шаблона. В production превышение пишется
+в лог, со строгим QUERY_BUDGET_STRICT (так запускаются тесты)
+обработка падает с QueryBudgetExceeded. Сводку по view копит
+общий кэш, ее показывает команда query_report.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from yatube.settings import (BASE_DIR, QUERY_DUPLICATE_THRESHOLD,
+                             QUERY_STATS_FLUSH)
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = 'querystats:{}:{}'
+STATS_FIELDS = ('requests', 'queries', 'time_us', 'over_budget', 'duplicates')
+# Сводка по базе копится под этим именем рядом со сводками view.
+DATABASE_STATS = 'db:{}'
+
+Budget = namedtuple('Budget', 'queries time')
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+_flushed = time.monotonic()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """View вышла за бюджет запросов."""
+
+
+def budget(view, queries=None, time=None):
+    """Оборачивает view с бюджетом: queries — запросов, time — мс."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return view(*args, **kwargs)
+    wrapper.query_budget = Budget(queries, time)
+    return wrapper
+
+
+def call_site():
+    """Первая строка кода проекта в стеке, откуда ушел запрос."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(BASE_DIR) and filename != __file__
+                and 'site-packages' not in filename):
+            path = os.path.relpath(filename, BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return '?'
+
+
+class QueryLog:
+    """Запросы, прошедшие через execute_wrapper: (sql, секунды, место)."""
+
+    def __init__(self):
+        self.queries = []
+        # Число и время запросов по базам, с репликами их несколько.
+        self.aliases = Counter()
+        self.alias_time = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries.append((sql, duration, call_site()))
+            alias = context['connection'].alias
+            self.aliases[alias] += 1
+            self.alias_time[alias] += duration
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def time(self):
+        """Суммарное время запросов в миллисекундах."""
+        return sum(duration for _, duration, _ in self.queries) * 1000
+
+    def duplicates(self, threshold=QUERY_DUPLICATE_THRESHOLD):
+        """SQL, выполненный не меньше threshold раз, с местами вызова."""
+        sites = {}
+        for sql, _, site in self.queries:
+            sites.setdefault(sql, Counter())[site] += 1
+        return {
+            sql: counter for sql, counter in sites.items()
+            if sum(counter.values()) >= threshold
+        }
+
+    def problems(self, query_budget=None, check_time=True):
+        """Нарушения бюджета и повторы строками для лога."""
+        found = []
+        if query_budget is not None:
+            if (query_budget.queries is not None
+                    and self.count > query_budget.queries):
+                found.append(
+                    f'{self.count} запросов при бюджете '
+                    f'{query_budget.queries}'
+                )
+            if (check_time and query_budget.time is not None
+                    and self.time > query_budget.time):
+                found.append(
+                    f'{self.time:.1f} мс запросов при бюджете '
+                    f'{query_budget.time} мс'
+                )
+        for sql, counter in self.duplicates().items():
+            places = ', '.join(
+                f'{site} ×{count}' for site, count in counter.most_common()
+            )
+            found.append(
+                f'{sum(counter.values())} раз: {sql[:200]} ({places})'
+            )
+        return found
+
+
+@contextmanager
+def record_queries():
+    """Записывает запросы ко всем базам внутри блока в QueryLog."""
+    log = QueryLog()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(log))
+        yield log
+
+
+def add_stats(view_name, log, over_budget):
+    """Копит сводку по view и раз в QUERY_STATS_FLUSH пишет ее в кэш."""
+    global _flushed
+    with _pending_lock:
+        _pending[(view_name, 'requests')] += 1
+        _pending[(view_name, 'queries')] += log.count
+        _pending[(view_name, 'time_us')] += int(log.time * 1000)
+        _pending[(view_name, 'over_budget')] += int(over_budget)
+        _pending[(view_name, 'duplicates')] += int(bool(log.duplicates()))
+        for alias, queries in log.aliases.items():
+            _pending[(DATABASE_STATS.format(alias), 'queries')] += queries
+            _pending[(DATABASE_STATS.format(alias), 'time_us')] += int(
+                log.alias_time[alias] * 10 ** 6
+            )
+        if time.monotonic() - _flushed < QUERY_STATS_FLUSH:
+            return
+        pending = dict(_pending)
+        _pending.clear()
+        _flushed = time.monotonic()
+    flush_stats(pending)
+
+
+def flush_stats(pending=None):
+    if pending is None:
+        with _pending_lock:
+            pending = dict(_pending)
+            _pending.clear()
+    for (view_name, field), value in pending.items():
+        if not value:
+            continue
+        key = STATS_KEY.format(view_name, field)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            if not cache.add(key, value, None):
+                cache.incr(key, value)
+
+
+def get_stats(view_names):
+    """Сводка {view: {поле: значение}} из кэша."""
+    flush_stats()
+    keys = {
+        STATS_KEY.format(name, field): (name, field)
+        for name in view_names for field in STATS_FIELDS
+    }
+    stats = {}
+    for key, value in cache.get_many(list(keys)).items():
+        name, field = keys[key]
+        stats.setdefault(name, dict.fromkeys(STATS_FIELDS, 0))[field] = value
+    return stats
+
+
+def reset_stats(view_names):
+    # Иначе накопленное в процессе вернется в кэш при следующем сбросе.
+    names = set(view_names)
+    with _pending_lock:
+        for name, field in list(_pending):
+            if name in names:
+                del _pending[(name, field)]
+    cache.delete_many([
+        STATS_KEY.format(name, field)
+        for name in view_names for field in STATS_FIELDS
+    ])
+
+
+class QueryBudgetMiddleware:
+    """Сверяет запросы каждой обработки с бюджетом ее view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as log:
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is None:
+            return response
+        query_budget = getattr(match.func, 'query_budget', None)
+        strict = getattr(settings, 'QUERY_BUDGET_STRICT', False)
+        # Время запросов в тестах не показательно, там важно только число.
+        problems = log.problems(query_budget, check_time=not strict)
+        add_stats(match.view_name, log, bool(problems))
+        if problems:
+            message = f'{request.path} ({match.view_name}): ' + '; '.join(
+                problems
+            )
+            if strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
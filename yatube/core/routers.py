@@ -0,0 +1,169 @@
+"""Чтение с реплик, запись и чтение своих записей — с основной базы.
+
+ReplicaRouter отправляет чтение на случайную реплику из
+DATABASE_REPLICAS, если ее отставание не больше REPLICA_MAX_LAG.
+Запись всегда идет в основную базу, и после нее поток до конца
+запроса читает тоже оттуда. ReplicaMiddleware продлевает это
+на REPLICA_STICKY_SECONDS: ответ на запрос с записью (новый пост,
+комментарий, подписка, вход) ставит cookie со временем записи,
+и пока она жива, запросы этого пользователя читают только реплики,
+скопированные позже этого времени, а без таких — основную базу.
+
+Пока страница, голова ленты или объект читаются для общего кэша,
+чтение идет с основной базы (primary_reads): bump() меняет версию
+сразу, и копия с отставшей реплики легла бы в кэш под новой версией
+и отдавалась бы всем, в том числе автору записи.
+
+Отставание реплики — возраст отметки Heartbeat в ее копии:
+sync_replicas обновляет отметку на основной базе перед каждым
+копированием. Процесс перечитывает отметки раз в REPLICA_LAG_CHECK
+секунд.
+"""
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from yatube.settings import (DATABASE_REPLICAS, REPLICA_LAG_CHECK,
+                             REPLICA_MAX_LAG, REPLICA_STICKY_SECONDS)
+
+STICKY_COOKIE = 'read_primary'
+HEARTBEAT = 'replication'
+
+_state = threading.local()
+_beats = {}
+_decisions = Counter()
+_decisions_lock = threading.Lock()
+
+
+def wrote():
+    """Писал ли поток в базу с начала запроса."""
+    return getattr(_state, 'wrote', False)
+
+
+def reset(since=None):
+    """Начало запроса: since — время последней записи пользователя."""
+    _state.wrote = False
+    _state.since = since
+
+
+@contextmanager
+def primary_reads():
+    """Чтение внутри блока — с основной базы: результат ляжет в общий кэш."""
+    previous = getattr(_state, 'primary', False)
+    _state.primary = True
+    try:
+        yield
+    finally:
+        _state.primary = previous
+
+
+def replica_beat(alias):
+    """Время отметки в копии реплики, None — реплика недоступна."""
+    from core.models import Heartbeat
+
+    checked, beat = _beats.get(alias, (None, None))
+    now = time.monotonic()
+    if checked is not None and now - checked < REPLICA_LAG_CHECK:
+        return beat
+    try:
+        beat = Heartbeat.objects.using(alias).filter(
+            name=HEARTBEAT
+        ).values_list('beat', flat=True).first()
+    except DatabaseError:
+        beat = None
+    if beat is not None:
+        beat = beat.timestamp()
+    _beats[alias] = (now, beat)
+    return beat
+
+
+def sticky_cookie(response, since=None):
+    """Держит пользователя на свежих данных после его записи."""
+    response.set_cookie(
+        STICKY_COOKIE, repr(time.time() if since is None else since),
+        max_age=REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax',
+    )
+
+
+def cookie_since(request):
+    try:
+        return float(request.COOKIES[STICKY_COOKIE])
+    except (KeyError, ValueError):
+        return None
+
+
+def count_decision(alias, reason):
+    with _decisions_lock:
+        _decisions[(alias, reason)] += 1
+
+
+def decisions():
+    """{(база, причина): сколько раз чтение ушло туда} в этом процессе."""
+    with _decisions_lock:
+        return dict(_decisions)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not DATABASE_REPLICAS:
+            return None
+        if wrote():
+            count_decision(DEFAULT_DB_ALIAS, 'write')
+            return DEFAULT_DB_ALIAS
+        if getattr(_state, 'primary', False):
+            count_decision(DEFAULT_DB_ALIAS, 'cache')
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            count_decision(DEFAULT_DB_ALIAS, 'transaction')
+            return DEFAULT_DB_ALIAS
+        oldest = time.time() - REPLICA_MAX_LAG
+        since = getattr(_state, 'since', None)
+        if since is not None:
+            oldest = max(oldest, since)
+        beats = {alias: replica_beat(alias) for alias in DATABASE_REPLICAS}
+        fresh = [
+            alias for alias, beat in beats.items()
+            if beat is not None and beat >= oldest
+        ]
+        if not fresh:
+            count_decision(
+                DEFAULT_DB_ALIAS, 'lag' if since is None else 'sticky'
+            )
+            return DEFAULT_DB_ALIAS
+        alias = random.choice(fresh)
+        count_decision(alias, 'replica')
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и на основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Держит запросы пользователя на основной базе после его записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset(since=cookie_since(request))
+        try:
+            response = self.get_response(request)
+            # Время берется после ответа: все транзакции запроса
+            # уже закоммичены и попадут в следующую копию.
+            if DATABASE_REPLICAS and wrote():
+                sticky_cookie(response)
+            return response
+        finally:
+            reset()
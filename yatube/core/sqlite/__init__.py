@@ -0,0 +1,14 @@
+"""SQLite для нескольких потоков и процессов одного сервера.
+
+Бэкенд core.sqlite — обычный django.db.backends.sqlite3 с двумя
+добавками. Каждое новое соединение получает прагмы из SQLITE_PRAGMAS
+(WAL, busy_timeout, mmap...), переопределить их для одной базы можно
+ключом PRAGMAS в DATABASES. Пишущие транзакции одного процесса
+проходят через очередь записи WriteGate: поток ждет ее не дольше
+WRITE_GATE секунд вместо того, чтобы получить от SQLite
+«database is locked» при попытке поднять чтение до записи.
+
+Транзакцию, которая будет писать, открывает atomic_write() из
+core.sqlite.transaction: BEGIN IMMEDIATE сразу берет и очередь,
+и блокировку SQLite. Читающие блоки atomic() их не занимают.
+"""
@@ -0,0 +1,126 @@
+import re
+
+from django.db.backends.sqlite3 import base
+
+from core.sqlite.gate import get_gate
+from yatube.settings import SQLITE_PRAGMAS, SQLITE_WRITE_GATE_TIMEOUT
+
+Database = base.Database
+
+WRITE_SQL = re.compile(
+    r'\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b', re.IGNORECASE
+)
+PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+
+
+class GatedCursorWrapper(base.SQLiteCursorWrapper):
+    """Курсор, который перед записью встает в очередь своей базы."""
+
+    def __init__(self, connection, wrapper):
+        super().__init__(connection)
+        self.wrapper = wrapper
+
+    def execute(self, query, params=None):
+        self.wrapper.enter_gate(query)
+        try:
+            return super().execute(query, params)
+        finally:
+            self.wrapper.leave_gate()
+
+    def executemany(self, query, param_list):
+        self.wrapper.enter_gate(query)
+        try:
+            return super().executemany(query, param_list)
+        finally:
+            self.wrapper.leave_gate()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """sqlite3 с прагмами соединения и очередью записи.
+
+    Транзакции atomic_write() открываются как BEGIN IMMEDIATE и занимают
+    очередь до конца. Обычный atomic() остается отложенным BEGIN
+    и встает в очередь на первой записи, запись вне транзакции —
+    на время запроса.
+
+    Ключи DATABASES сверх обычных:
+        PRAGMAS — прагмы поверх SQLITE_PRAGMAS;
+        WRITE_GATE — сколько секунд ждать очередь записи,
+        0 — без очереди.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.gate = None
+        self.gate_timeout = self.settings_dict.get(
+            'WRITE_GATE', SQLITE_WRITE_GATE_TIMEOUT
+        )
+        self.in_gate = False
+        self.write_intent = False
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = dict(SQLITE_PRAGMAS, **self.settings_dict.get('PRAGMAS', {}))
+        for name, value in pragmas.items():
+            if not PRAGMA_NAME.match(name):
+                raise ValueError(f'Недопустимое имя прагмы: {name}')
+            connection.execute(f'PRAGMA {name} = {value}')
+        if self.gate_timeout:
+            self.gate = get_gate(self.settings_dict['NAME'])
+        return connection
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(
+            factory=lambda connection: GatedCursorWrapper(connection, self)
+        )
+
+    def enter_gate(self, query=None):
+        """Встает в очередь перед записью; query=None — в любом случае."""
+        if self.gate is None or self.in_gate:
+            return
+        if query is not None and not WRITE_SQL.match(query):
+            return
+        if not self.gate.acquire(self.gate_timeout):
+            raise Database.OperationalError(
+                f'database is locked: очередь записи занята дольше '
+                f'{self.gate_timeout} с'
+            )
+        self.in_gate = True
+
+    def leave_gate(self):
+        """Отпускает очередь, когда транзакция с записью закончилась."""
+        if self.in_gate and not (
+            self.connection is not None and self.connection.in_transaction
+        ):
+            self.in_gate = False
+            self.gate.release()
+
+    def _start_transaction_under_autocommit(self):
+        if not self.write_intent:
+            # Читающим транзакциям не нужны ни очередь, ни блокировка.
+            return super()._start_transaction_under_autocommit()
+        # atomic_write() сразу берет блокировку на запись: транзакция,
+        # начатая чтением, не сможет потом стать пишущей, если ее снимок
+        # устарел.
+        self.enter_gate()
+        self.cursor().execute('BEGIN IMMEDIATE')
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self.leave_gate()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self.leave_gate()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            if self.in_gate:
+                self.in_gate = False
+                self.gate.release()
@@ -0,0 +1,91 @@
+"""Очередь записи: один пишущий поток на базу в процессе."""
+import os
+import threading
+import time
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+class WriteGate:
+    """Блокировка на запись с ограниченным ожиданием и счетчиками."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.acquired = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+    def acquire(self, timeout):
+        """True, если очередь получена за timeout секунд."""
+        if self._lock.acquire(blocking=False):
+            waited = 0.0
+        else:
+            started = time.perf_counter()
+            if not self._lock.acquire(timeout=timeout):
+                with self._stats_lock:
+                    self.timeouts += 1
+                return False
+            waited = time.perf_counter() - started
+        self._held_since = time.perf_counter()
+        with self._stats_lock:
+            self.acquired += 1
+            self.contended += int(waited > 0)
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        return True
+
+    def release(self):
+        held = time.perf_counter() - self._held_since
+        self._lock.release()
+        with self._stats_lock:
+            self.hold_total += held
+            self.hold_max = max(self.hold_max, held)
+
+    def stats(self):
+        """Снимок счетчиков, время в миллисекундах."""
+        with self._stats_lock:
+            return {
+                'acquired': self.acquired,
+                'contended': self.contended,
+                'timeouts': self.timeouts,
+                'wait_ms': round(self.wait_total * 1000, 3),
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+                'hold_ms': round(self.hold_total * 1000, 3),
+                'hold_max_ms': round(self.hold_max * 1000, 3),
+            }
+
+
+def get_gate(name):
+    """Общая для всех потоков процесса очередь базы name."""
+    with _gates_lock:
+        if name not in _gates:
+            _gates[name] = WriteGate(name)
+        return _gates[name]
+
+
+def gate_stats():
+    """{база: счетчики} для очередей этого процесса."""
+    with _gates_lock:
+        gates = list(_gates.values())
+    return {gate.name: gate.stats() for gate in gates}
+
+
+def _forget_gates():
+    # Блокировки, захваченные в момент fork другими потоками,
+    # в дочернем процессе никто не отпустит.
+    global _gates_lock
+    _gates.clear()
+    _gates_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_gates)
@@ -0,0 +1,53 @@
+"""Помощники тестов: строгие бюджеты запросов и отдельные кэши."""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+from core.queries import Budget, QueryBudgetExceeded, record_queries
+
+
+def isolate_caches():
+    """Переносит файловые кэши во временный каталог и возвращает его.
+
+    Иначе тесты читали бы и чистили кэш разработчика рядом с базой.
+    Вызывать до первого обращения к кэшам.
+    """
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    for options in settings.CACHES.values():
+        if options['BACKEND'] == 'core.cache.SQLiteCache':
+            options['LOCATION'] = os.path.join(
+                directory, os.path.basename(options['LOCATION'])
+            )
+    return directory
+
+
+class QueryBudgetRunner(DiscoverRunner):
+    """Запуск тестов, в котором выход view за бюджет — ошибка теста,
+    а кэши лежат во временном каталоге.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET_STRICT = True
+        self.cache_directory = isolate_caches()
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
+
+
+@contextmanager
+def query_budget(queries=None, time=None):
+    """with query_budget(queries=3): падает с отчетом о запросах блока.
+
+    В отчете, как и у middleware, повторяющийся SQL с местами вызова.
+    """
+    with record_queries() as log:
+        yield log
+    problems = log.problems(Budget(queries, time))
+    if problems:
+        raise QueryBudgetExceeded('; '.join(problems))
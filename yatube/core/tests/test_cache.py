@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core import cache as sqlite_cache
+from core.cache import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_values_are_shared_between_instances(self):
+        """ Запись одного экземпляра видна другому, как другому процессу """
+        self.cache.set('fragment', {'html': '<p>пост</p>'})
+        self.cache.set_many({'a': 1, 'b': [2]})
+        other = self.make_cache()
+        self.assertEqual(other.get('fragment'), {'html': '<p>пост</p>'})
+        self.assertEqual(
+            other.get_many(['a', 'b', 'missing']), {'a': 1, 'b': [2]})
+        other.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_timeout_and_add(self):
+        """ Просроченная запись не читается, add не затирает живую """
+        self.cache.set('short', 'value', 1)
+        self.assertFalse(self.cache.add('short', 'other'))
+        with mock.patch('time.time', return_value=time.time() + 2):
+            self.assertIsNone(self.cache.get('short'))
+            self.assertFalse(self.cache.has_key('short'))
+            self.assertTrue(self.cache.add('short', 'other'))
+        self.assertEqual(self.cache.get('short'), 'other')
+
+    def test_incr_is_atomic(self):
+        """ incr из нескольких потоков не теряет увеличений """
+        self.cache.set('counter', 0, None)
+
+        def increment():
+            for _ in range(100):
+                self.cache.incr('counter')
+
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 400)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_expired_key(self):
+        """ incr просроченной записи — ошибка, запись не оживает """
+        self.cache.set('counter', 1, 1)
+        self.cache.set('flag', True, 1)
+        with mock.patch('time.time', return_value=time.time() + 2):
+            for key in ('counter', 'flag'):
+                with self.assertRaises(ValueError):
+                    self.cache.incr(key)
+                self.assertIsNone(self.cache.get(key))
+
+    def test_lru_evicts_least_recently_used(self):
+        """ При переполнении уходят давно не читанные записи """
+        cache = self.make_cache(MAX_ENTRIES=4, CULL_FREQUENCY=2)
+        with mock.patch.object(sqlite_cache, 'CULL_EVERY', 1):
+            for i in range(4):
+                cache.set(f'key{i}', i)
+            cache.get_many(['key0', 'key1'])
+            cache.flush_touches()
+            cache.set('key4', 4)
+        self.assertEqual(
+            sorted(cache.get_many([f'key{i}' for i in range(5)])),
+            ['key0', 'key1', 'key4'])
+
+    def test_lfu_evicts_least_frequently_used(self):
+        """ LFU оставляет самые читаемые записи """
+        cache = self.make_cache(
+            MAX_ENTRIES=2, CULL_FREQUENCY=3, POLICY='lfu')
+        with mock.patch.object(sqlite_cache, 'CULL_EVERY', 1):
+            cache.set('hot', 1)
+            cache.set('cold', 2)
+            for _ in range(3):
+                cache.get('hot')
+            cache.flush_touches()
+            cache.set('new', 3)
+        self.assertEqual(cache.get_many(['hot', 'cold']), {'hot': 1})
@@ -0,0 +1,94 @@
+import re
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+User = get_user_model()
+CALLS = []
+
+
+@jobs.task
+def remember(value):
+    CALLS.append(value)
+
+
+@jobs.task
+def explode():
+    raise ValueError('Не вышло')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_worker_runs_jobs_by_priority(self):
+        """ Обработчик выполняет задачи, срочные — первыми """
+        remember.delay('обычная')
+        remember.delay('срочная', priority=5)
+        remember.delay('отложенная', run_at=timezone.now() + timedelta(1))
+        jobs.work('test', burst=True)
+        self.assertEqual(CALLS, ['срочная', 'обычная'])
+        self.assertEqual(
+            Job.objects.filter(status=Job.DONE).count(), 2)
+        self.assertEqual(jobs.stats()['scheduled'], 1)
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        """ Захваченную задачу не получит другой обработчик """
+        remember.delay('одна')
+        job = jobs.claim('first')
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 1))
+        self.assertIsNone(jobs.claim('second'))
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """ Упавшая задача повторяется с задержкой, затем помечается """
+        explode.delay(max_attempts=2)
+        jobs.work('test', burst=True)
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('Не вышло', job.last_error)
+        Job.objects.update(run_at=timezone.now())
+        jobs.work('test', burst=True)
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_stale_job_is_requeued(self):
+        """ Задача упавшего обработчика возвращается в очередь """
+        remember.delay('зависшая')
+        jobs.claim('dead')
+        Job.objects.update(started_at=timezone.now() - timedelta(1))
+        jobs.housekeeping()
+        self.assertEqual(Job.objects.get().status, Job.QUEUED)
+
+    def test_password_reset_email_is_queued(self):
+        """ Письмо сброса пароля отправляет обработчик очереди """
+        User.objects.create_user(
+            username='forgetful', email='forgetful@example.com',
+            password='secret-password')
+        Client().post(
+            reverse('users:password_reset'),
+            {'email': 'forgetful@example.com'})
+        self.assertEqual(len(mail.outbox), 0)
+        args = Job.objects.get().args
+        jobs.work('test', burst=True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['forgetful@example.com'])
+        link, = re.findall(r'https?://\S+', mail.outbox[0].body)
+        self.assertNotIn(link.rstrip('/').rsplit('/', 1)[-1], args)
+
+    def test_admin_shows_queue_stats(self):
+        """ Админка показывает глубину очереди """
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        remember.delay('ждет')
+        response = client.get(reverse('admin:core_job_changelist'))
+        self.assertEqual(response.context['queue_stats']['ready'], 1)
+        self.assertContains(response, 'Готовы к запуску')
@@ -0,0 +1,72 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+
+from core.queries import (Budget, QueryBudgetExceeded, add_stats, get_stats,
+                          record_queries, reset_stats)
+from core.testing import query_budget
+from posts.models import Post
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='budget-author')
+        for i in range(6):
+            Post.objects.create(author=author, text=f'Пост {i}')
+
+    def test_repeated_sql_reported_with_call_site(self):
+        """ N+1 попадает в отчет вместе с местом вызова """
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with query_budget(queries=10):
+                for post in Post.objects.all():
+                    post.author.username
+        self.assertIn('6 раз', str(raised.exception))
+        self.assertIn('core/tests/test_queries.py', str(raised.exception))
+        with query_budget(queries=1):
+            list(Post.objects.select_related('author'))
+
+    def test_view_over_budget_fails_in_tests(self):
+        """ В тестах выход view за бюджет — ошибка """
+        func = resolve(reverse('posts:index')).func
+        with mock.patch.object(func, 'query_budget', Budget(0, None)):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('posts:index'))
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_view_over_budget_logged_in_production(self):
+        """ В production превышение только пишется в лог """
+        func = resolve(reverse('posts:index')).func
+        with mock.patch.object(func, 'query_budget', Budget(0, None)):
+            with self.assertLogs('core.queries', 'WARNING') as logs:
+                response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('posts:index', logs.output[0])
+
+    def test_report_command(self):
+        """ query_report показывает сводку по view с бюджетом """
+        call_command('query_report', reset=True, stdout=StringIO())
+        self.client.get(reverse('posts:index'))
+        out = StringIO()
+        call_command('query_report', stdout=out)
+        line, = [
+            line for line in out.getvalue().splitlines()
+            if line.startswith('posts:index ')
+        ]
+        self.assertEqual(line.split()[1], '1')
+        self.assertEqual(line.split()[3], '6')
+
+    def test_reset_drops_pending_stats(self):
+        """ Сброс сводки убирает и не записанное в кэш """
+        with record_queries() as log:
+            Post.objects.count()
+        add_stats('posts:index', log, False)
+        reset_stats(['posts:index'])
+        self.assertEqual(get_stats(['posts:index']), {})
@@ -0,0 +1,104 @@
+import datetime as dt
+import time
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from core import routers
+from core.models import Heartbeat
+from core.queries import record_queries
+from posts.cache import bump, cache_page
+from posts.models import Post
+
+
+@mock.patch('core.routers.DATABASE_REPLICAS', ('replica',))
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        # Реплика — то же соединение, что и основная база теста.
+        connections['replica'] = connections['default']
+        self.addCleanup(delattr, connections._connections, 'replica')
+        routers._beats.clear()
+        self.router = routers.ReplicaRouter()
+
+    def beat(self, seconds_ago):
+        Heartbeat.objects.update_or_create(
+            name=routers.HEARTBEAT,
+            defaults={
+                'beat': timezone.now() - dt.timedelta(seconds=seconds_ago)
+            },
+        )
+        routers.reset()
+        routers._beats.clear()
+
+    def read(self):
+        # Тест идет внутри транзакции, а в ней чтение всегда с основной.
+        with mock.patch.object(connections['default'], 'in_atomic_block',
+                               False):
+            return self.router.db_for_read(Post)
+
+    def test_reads_follow_replica_lag(self):
+        """ Свежая реплика читается, отставшая и без отметки — нет """
+        self.assertEqual(self.read(), 'default')
+        self.beat(seconds_ago=1)
+        self.assertEqual(self.read(), 'replica')
+        self.beat(seconds_ago=100)
+        self.assertEqual(self.read(), 'default')
+        decisions = routers.decisions()
+        self.assertTrue(decisions[('default', 'lag')])
+        self.assertTrue(decisions[('replica', 'replica')])
+
+    def test_own_writes_read_from_primary(self):
+        """ После записи пользователь читает только реплики новее нее """
+        self.beat(seconds_ago=5)
+        factory = RequestFactory()
+
+        def view(request):
+            reads = [self.read()]
+            if request.method == 'POST':
+                self.router.db_for_write(Post)
+                reads.append(self.read())
+            return HttpResponse(','.join(reads))
+
+        middleware = routers.ReplicaMiddleware(view)
+        response = middleware(factory.post('/'))
+        self.assertEqual(response.content, b'replica,default')
+        cookie = response.cookies[routers.STICKY_COOKIE].value
+        request = factory.get('/')
+        request.COOKIES[routers.STICKY_COOKIE] = cookie
+        self.assertEqual(middleware(request).content, b'default')
+        self.assertEqual(middleware(factory.get('/')).content, b'replica')
+        # Реплика скопирована после записи — ее снова можно читать.
+        self.beat(seconds_ago=time.time() - float(cookie) - 1)
+        response = middleware(request)
+        self.assertEqual(response.content, b'replica')
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+    def test_shared_cache_filled_from_primary(self):
+        """ Страница для общего кэша читается с основной базы """
+        self.beat(seconds_ago=1)
+        cache.clear()
+        caches['template_fragments'].clear()
+
+        @cache_page('posts')
+        def view(request):
+            reads.append(self.read())
+            return HttpResponse('ok')
+
+        reads = []
+        view(RequestFactory().get('/cached/'))
+        bump('posts')
+        view(RequestFactory().get('/cached/'))
+        self.assertEqual(reads, ['default', 'default'])
+        self.assertEqual(self.read(), 'replica')
+        self.assertTrue(routers.decisions()[('default', 'cache')])
+
+    def test_queries_counted_per_alias(self):
+        """ Запросы считаются по базам """
+        with record_queries() as log:
+            list(Post.objects.all())
+        self.assertEqual(dict(log.aliases), {'default': 1})
+        self.assertGreater(log.alias_time['default'], 0)
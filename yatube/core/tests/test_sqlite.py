@@ -0,0 +1,85 @@
+import threading
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from core.sqlite.gate import WriteGate
+from core.sqlite.transaction import atomic_write
+from posts.models import Group
+from yatube.settings import SQLITE_PRAGMAS
+
+User = get_user_model()
+
+
+class SQLiteTuningTests(TestCase):
+    def test_pragmas_applied_to_connection(self):
+        """ Новое соединение получает прагмы из SQLITE_PRAGMAS """
+        with connection.cursor() as cursor:
+            for name in ('busy_timeout', 'cache_size'):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0], SQLITE_PRAGMAS[name])
+
+
+class AtomicWriteTests(TransactionTestCase):
+    def test_only_writing_blocks_take_gate(self):
+        """ Читающий atomic() не занимает очередь, atomic_write — сразу """
+        with transaction.atomic():
+            Group.objects.count()
+            self.assertFalse(connection.in_gate)
+            Group.objects.create(title='Группа', slug='gate')
+            self.assertTrue(connection.in_gate)
+        self.assertFalse(connection.in_gate)
+        with atomic_write():
+            self.assertTrue(connection.in_gate)
+        self.assertFalse(connection.in_gate)
+
+    def test_form_page_does_not_take_gate(self):
+        """ Страница формы без записи не открывает пишущую транзакцию """
+        user = User.objects.create_user(username='gate-reader')
+        self.client.force_login(user)
+        connection.ensure_connection()
+        acquired = connection.gate.stats()['acquired']
+        response = self.client.get(reverse('posts:post_create'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(connection.gate.stats()['acquired'], acquired)
+
+
+class WriteGateTests(SimpleTestCase):
+    def test_waiting_is_bounded_and_counted(self):
+        """ Очередь занята — ожидание ограничено и попадает в счетчики """
+        gate = WriteGate('test')
+        taken, done = threading.Event(), threading.Event()
+
+        def hold():
+            gate.acquire(1)
+            taken.set()
+            done.wait(1)
+            gate.release()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        taken.wait(1)
+        self.assertFalse(gate.acquire(0.01))
+        done.set()
+        self.assertTrue(gate.acquire(1))
+        gate.release()
+        thread.join()
+        stats = gate.stats()
+        self.assertEqual((stats['acquired'], stats['timeouts']), (2, 1))
+        self.assertGreater(stats['hold_max_ms'], 0)
+
+    def test_bench_writers_do_not_fail(self):
+        """ Под очередью записи параллельные писатели не ловят блокировок """
+        out = StringIO()
+        call_command(
+            'sqlite_bench', '--writers', '4', '--readers', '2',
+            '--duration', '0.3', stdout=out,
+        )
+        tuned = out.getvalue().splitlines()[2]
+        self.assertTrue(tuned.startswith('настроено'))
+        self.assertEqual(tuned.split()[-1], '0')
+        self.assertIn('очередь записи', out.getvalue())
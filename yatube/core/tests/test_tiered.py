@@ -0,0 +1,94 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.tiered import TieredCache, cached
+from posts.models import Post
+
+User = get_user_model()
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def make_cache(self, location, **options):
+        # L1 общий для экземпляров с одним LOCATION, как у процесса.
+        options.setdefault('LOCK_TIMEOUT', 0.2)
+        return TieredCache(f'{self.id()}:{location}', {'OPTIONS': options})
+
+    def test_only_one_caller_recomputes(self):
+        """ На промахе None получает только захвативший пересчет """
+        first = self.make_cache('first')
+        second = self.make_cache('second')
+        self.assertIsNone(first.get('fragment'))
+        self.assertEqual(second.get('fragment', 'ждал'), 'ждал')
+        first.set('fragment', '<p>пост</p>', 60)
+        self.assertEqual(second.get('fragment'), '<p>пост</p>')
+
+    def test_stale_value_served_while_revalidating(self):
+        """ Пока один пересчитывает, другие получают прежнее значение """
+        first = self.make_cache('first', BETA=0)
+        second = self.make_cache('second', BETA=0, L1_TIMEOUT=0)
+        first.set('fragment', 'старое', 1)
+        with mock.patch('time.time', return_value=time.time() + 2):
+            self.assertIsNone(first.get('fragment'))
+            self.assertEqual(second.get('fragment'), 'старое')
+            first.set('fragment', 'новое', 60)
+            self.assertEqual(second.get('fragment'), 'новое')
+
+    def test_versions_are_separate_in_memory(self):
+        """ Версия ключа учитывается и в памяти процесса """
+        tiered = self.make_cache('versions')
+        tiered.set('fragment', 'первая', 60, version=1)
+        self.assertEqual(tiered.get('fragment', version=1), 'первая')
+        self.assertEqual(tiered.get('fragment', 'нет', version=2), 'нет')
+        tiered.set('fragment', 'вторая', 60, version=2)
+        tiered.delete('fragment', version=1)
+        self.assertIsNone(tiered.get('fragment', version=1))
+        self.assertEqual(tiered.get('fragment', version=2), 'вторая')
+
+    def test_wait_for_other_recompute_is_bounded(self):
+        """ Чужой пересчет без результата ждут не дольше WAIT_TIMEOUT """
+        first = self.make_cache('first', LOCK_TIMEOUT=10, WAIT_TIMEOUT=0.1)
+        second = self.make_cache('second', LOCK_TIMEOUT=10, WAIT_TIMEOUT=0.1)
+        self.assertIsNone(first.get('fragment'))
+        started = time.monotonic()
+        self.assertEqual(second.get('fragment', 'сам'), 'сам')
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_early_expiration_depends_on_compute_time(self):
+        """ Долгий пересчет начинается раньше срока """
+        tiered = self.make_cache('early')
+        expires = time.time() + 1
+        with mock.patch('random.random', return_value=0.01):
+            self.assertFalse(tiered.is_fresh(('value', expires, 10)))
+            self.assertTrue(tiered.is_fresh(('value', expires, 0)))
+
+    def test_cached_decorator(self):
+        """ Декоратор считает значение один раз на ключ """
+        calls = []
+
+        @cached(60, key=lambda value: f'double:{value}' if value else None)
+        def double(value):
+            calls.append(value)
+            return value * 2
+
+        self.assertEqual(double(21), 42)
+        self.assertEqual(double(21), 42)
+        self.assertEqual(double(0), 0)
+        self.assertEqual(double(0), 0)
+        self.assertEqual(calls, [21, 0, 0])
+
+    def test_index_page_served_without_queries(self):
+        """ Повторный запрос главной не ходит в базу """
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост в кэше')
+        response = self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(reverse('posts:index'))
+        self.assertEqual(cached_response.content, response.content)
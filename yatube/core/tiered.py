@@ -0,0 +1,226 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим кэшем.
+
+Горячий фрагмент, например первая страница index_page, читается
+из памяти процесса без обращения к общему кэшу. Когда он устаревает,
+пересчитывает его один запрос: остальные в это время получают
+прежнее значение или ждут результат, а не рендерят то же самое.
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Хранилища L1 по LOCATION, общие для всех потоков процесса,
+# как у LocMemCache.
+_stores = {}
+_inflight = {}
+_locks = {}
+
+MISSING = object()
+
+
+class TieredCache(BaseCache):
+    """Кэш L1 + L2 с защитой от лавины пересчетов.
+
+    В L2 лежит конверт (значение, срок свежести, время пересчета).
+    Запись живет в L2 дольше срока свежести на STALE_TIMEOUT,
+    и пока один запрос пересчитывает ее, остальные получают
+    устаревшее значение. Пересчет начинается чуть раньше срока
+    с вероятностью, растущей к его концу (XFetch): чем дольше
+    считается значение, тем раньше.
+
+    get() на промахе отдает None только одному вызывающему —
+    тому, кто захватил блокировку пересчета; его set() ее снимает.
+    Так работают и {% cache %}, и декоратор cached.
+
+    OPTIONS:
+        L2 — псевдоним общего кэша;
+        L1_ENTRIES — размер LRU процесса;
+        L1_TIMEOUT — сколько секунд L1 верит записи без L2:
+            удаление в другом процессе видно не позже этого срока;
+        STALE_TIMEOUT — сколько отдавать устаревшее значение;
+        LOCK_TIMEOUT — сколько держится блокировка пересчета;
+        WAIT_TIMEOUT — сколько запрос ждет чужой пересчет, когда
+            отдать нечего; потом он считает значение сам;
+        BETA — агрессивность раннего пересчета, 0 выключает его.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = options.get('L2', 'default')
+        self.l1_entries = options.get('L1_ENTRIES', 1000)
+        self.l1_timeout = options.get('L1_TIMEOUT', 10)
+        self.stale_timeout = options.get('STALE_TIMEOUT', 60)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        self.wait_timeout = min(
+            options.get('WAIT_TIMEOUT', 1), self.lock_timeout
+        )
+        self.beta = options.get('BETA', 1.0)
+        self._l1 = _stores.setdefault(location, OrderedDict())
+        self._inflight = _inflight.setdefault(location, {})
+        self._lock = _locks.setdefault(location, threading.Lock())
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            envelope, until = entry
+            if until <= time.time():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return envelope
+
+    def _l1_set(self, key, envelope):
+        with self._lock:
+            self._l1[key] = (envelope, time.time() + self.l1_timeout)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_entries:
+                self._l1.popitem(last=False)
+
+    def _envelope(self, key, version):
+        # L1 хранит записи под полным ключом, как L2: с префиксом
+        # и версией.
+        local = self.make_key(key, version)
+        envelope = self._l1_get(local)
+        if envelope is None:
+            envelope = self.l2.get(key, version=version)
+            if envelope is not None:
+                self._l1_set(local, envelope)
+        return envelope
+
+    def is_fresh(self, envelope):
+        _, expires, delta = envelope
+        if expires is None:
+            return True
+        # XFetch: log(random()) < 0, так что срок сдвигается раньше
+        # на случайную долю времени пересчета.
+        early = delta * self.beta * math.log(random.random() or 1e-12)
+        return time.time() - early < expires
+
+    def _claim(self, key, version):
+        """Захватывает пересчет ключа или возвращает чужое событие."""
+        now = time.time()
+        local = self.make_key(key, version)
+        with self._lock:
+            flight = self._inflight.get(local)
+            if flight is not None and flight[1] + self.lock_timeout > now:
+                return flight[0]
+            claimed = self.l2.add(
+                f'lock:{key}', 1, self.lock_timeout, version=version
+            )
+            if claimed:
+                self._inflight[local] = (threading.Event(), now)
+                return None
+            return False
+
+    def get(self, key, default=None, version=None):
+        envelope = self._envelope(key, version)
+        if envelope is not None and self.is_fresh(envelope):
+            return envelope[0]
+        waiting = self._claim(key, version)
+        if waiting is None:
+            return default
+        if envelope is not None:
+            return envelope[0]
+        # Значения нет совсем: недолго ждем, пока его посчитает другой.
+        # Если тот упал, не сняв блокировку, считаем сами.
+        deadline = time.time() + self.wait_timeout
+        while time.time() < deadline:
+            if waiting:
+                waiting.wait(deadline - time.time())
+            else:
+                time.sleep(0.05)
+            envelope = self._envelope(key, version)
+            if envelope is not None:
+                return envelope[0]
+            if waiting:
+                # Пересчет в этом процессе упал, считаем сами.
+                break
+        return default
+
+    def has_key(self, key, version=None):
+        return self._envelope(key, version) is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        now = time.time()
+        local = self.make_key(key, version)
+        with self._lock:
+            flight = self._inflight.get(local)
+        delta = now - flight[1] if flight else 0
+        envelope = (value, None if timeout is None else now + timeout, delta)
+        self.l2.set(
+            key, envelope,
+            None if timeout is None else timeout + self.stale_timeout,
+            version=version,
+        )
+        self._l1_set(local, envelope)
+        self.release(key, version)
+
+    def release(self, key, version=None):
+        """Снимает блокировку пересчета и будит ждущие потоки."""
+        with self._lock:
+            flight = self._inflight.pop(self.make_key(key, version), None)
+        if flight is not None:
+            self.l2.delete(f'lock:{key}', version=version)
+            flight[0].set()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self.get(key, MISSING, version) is not MISSING:
+            return False
+        self.set(key, value, timeout, version)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        with self._lock:
+            self._l1.pop(self.make_key(key, version), None)
+        self.l2.delete(key, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self.l2.clear()
+
+
+def cached(timeout, key, alias='template_fragments'):
+    """Кэширует результат функции по ключу key(*args, **kwargs).
+
+    Если key вернул None, функция вызывается без кэша.
+    Результат должен сериализоваться pickle.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs)
+            if cache_key is None:
+                return func(*args, **kwargs)
+            cache = caches[alias]
+            value = cache.get(cache_key, MISSING)
+            if value is not MISSING:
+                return value
+            try:
+                value = func(*args, **kwargs)
+            except BaseException:
+                if hasattr(cache, 'release'):
+                    cache.release(cache_key)
+                raise
+            cache.set(cache_key, value, timeout)
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,164 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from core.routers import primary_reads
+from posts import holes
+from yatube.settings import PAGE_CACHE_TIMEOUT
+
+GENERATION_KEY = 'generation:{}'
+MODIFIED_KEY = 'modified:{}'
+RESPONSE_KEY = 'response:{}'
+SHELL_KEY = 'shell:{}'
+
+
+def initial_generation():
+    """Начальное значение счетчика.
+
+    Берется от времени, чтобы после вытеснения счетчика из кэша
+    не совпасть с ключами фрагментов, которые еще лежат в кэше.
+    """
+    return int(time.time() * 1000)
+
+
+def versions(*scopes):
+    """Версия данных набора областей и время их последнего изменения.
+
+    Если отметки времени нет в кэше, область считается измененной
+    сейчас: так условный запрос получит полный ответ, а не старый 304.
+    """
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    modified_keys = [MODIFIED_KEY.format(scope) for scope in scopes]
+    values = cache.get_many(keys + modified_keys)
+    missing = [key for key in keys + modified_keys if key not in values]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(
+                key, initial_generation() if key in keys else now, None
+            )
+        values.update(cache.get_many(missing))
+    version = '.'.join(str(values.get(key, 0)) for key in keys)
+    modified = max(values.get(key, 0) for key in modified_keys)
+    return version, modified
+
+
+def generation(*scopes):
+    """Текущая версия данных для набора областей одной строкой.
+
+    Строка добавляется в ключ фрагмента {% cache %}: любое изменение
+    в одной из областей дает новый ключ.
+    """
+    return versions(*scopes)[0]
+
+
+def bump(*scopes):
+    """Инвалидирует все фрагменты, зависящие от областей scopes."""
+    cache.set_many(
+        {MODIFIED_KEY.format(scope): time.time() for scope in scopes}, None
+    )
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, initial_generation(), None)
+
+
+def cache_page(*scopes):
+    """Кэширует страницу по пути, запросу и версии областей scopes.
+
+    Области могут ссылаться на аргументы view: 'post:{post_id}'.
+
+    Анонимам без сессионной cookie страница отдается целиком.
+    ETag и Last-Modified считаются по версиям областей, поэтому
+    на If-None-Match и If-Modified-Since ответ 304 уходит без
+    обращения к базе.
+
+    С сессией кэшируется общая для всех оболочка страницы,
+    а пользовательские дырки ({% hole %}) заполняются для запроса
+    отдельно, без повторных запросов ленты.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            version, modified = versions(
+                *(scope.format(**kwargs) for scope in scopes)
+            )
+            page = f'{request.get_full_path()}|{version}'
+            if settings.SESSION_COOKIE_NAME in request.COOKIES:
+                return shell_response(page, view, request, *args, **kwargs)
+            digest = hashlib.md5(page.encode()).hexdigest()
+            etag, last_modified = quote_etag(digest), int(modified)
+            response = get_conditional_response(request, etag, last_modified)
+            if response is None:
+                response = cached_response(
+                    RESPONSE_KEY.format(digest), view, request,
+                    *args, **kwargs
+                )
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+                patch_cache_control(response, no_cache=True)
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+def shell_response(page, view, request, *args, **kwargs):
+    """Оболочка страницы из кэша с дырками, заполненными для request."""
+    digest = hashlib.md5(page.encode()).hexdigest()
+    request.render_shell = True
+    try:
+        response = cached_response(
+            SHELL_KEY.format(digest), view, request, *args, **kwargs
+        )
+    finally:
+        request.render_shell = False
+    if not response.streaming:
+        response.content = holes.fill(
+            response.content.decode(response.charset), request
+        )
+    return response
+
+
+def cached_response(key, view, request, *args, **kwargs):
+    """Ответ из кэша страниц или от view, если его там нет.
+
+    Хранится только тело: объект ответа меняют middleware,
+    и делить его между запросами нельзя. При промахе view читает
+    основную базу: страница ляжет в кэш под уже новой версией.
+    """
+    page_cache = caches['template_fragments']
+    stored = page_cache.get(key)
+    if stored is not None:
+        content, content_type = stored
+        return HttpResponse(content, content_type=content_type)
+    # Блокировку пересчета после промаха держит только TieredCache.
+    release = getattr(page_cache, 'release', None)
+    try:
+        with primary_reads():
+            response = view(request, *args, **kwargs)
+    except BaseException:
+        if release is not None:
+            release(key)
+        raise
+    if response.status_code != 200 or response.streaming:
+        if release is not None:
+            release(key)
+        return response
+    page_cache.set(
+        key, (response.content, response['Content-Type']),
+        PAGE_CACHE_TIMEOUT,
+    )
+    return response
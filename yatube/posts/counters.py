@@ -0,0 +1,103 @@
+from django.db.models import Count, F
+
+from posts.hydration import forget
+from posts.models import AuthorStats, Comment, Follow, Post
+
+
+def actual_stats(author_id):
+    """Счетчики автора, посчитанные по таблицам."""
+    return {
+        'posts_count': Post.objects.filter(author_id=author_id).count(),
+        'followers_count': Follow.objects.filter(author_id=author_id).count(),
+        'following_count': Follow.objects.filter(user_id=author_id).count(),
+    }
+
+
+def change_author_stats(author_id, create=True, **deltas):
+    """Сдвигает счетчики автора через F(), не читая строку.
+
+    Если строки еще нет, она создается по реальным данным — сдвиг
+    в них уже учтен. При удалениях create=False: строку может
+    удалять тот же каскад, что вызвал сигнал.
+    """
+    updated = AuthorStats.objects.filter(author_id=author_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated and create:
+        AuthorStats.objects.get_or_create(
+            author_id=author_id, defaults=actual_stats(author_id)
+        )
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+    forget(Post, post_id)
+
+
+def get_stats(author):
+    """Счетчики автора; недостающая строка создается на лету."""
+    try:
+        return author.stats
+    except AuthorStats.DoesNotExist:
+        stats, _ = AuthorStats.objects.get_or_create(
+            author=author, defaults=actual_stats(author.pk)
+        )
+        return stats
+
+
+def recount_authors(author_ids):
+    """Сверяет счетчики авторов с таблицами, возвращает число исправленных.
+
+    Реальные значения считаются тремя GROUP BY на весь список авторов.
+    """
+    actual = {
+        author_id: {
+            'posts_count': 0, 'followers_count': 0, 'following_count': 0
+        }
+        for author_id in author_ids
+    }
+    sources = (
+        ('posts_count', Post.objects.order_by(), 'author_id'),
+        ('followers_count', Follow.objects.all(), 'author_id'),
+        ('following_count', Follow.objects.all(), 'user_id'),
+    )
+    for field, queryset, key in sources:
+        rows = queryset.filter(**{f'{key}__in': author_ids}).values_list(
+            key
+        ).annotate(count=Count('id'))
+        for author_id, count in rows:
+            actual[author_id][field] = count
+    existing = AuthorStats.objects.in_bulk(author_ids)
+    fixed = 0
+    for author_id, values in actual.items():
+        stats = existing.get(author_id)
+        if stats is None:
+            AuthorStats.objects.create(author_id=author_id, **values)
+        elif any(getattr(stats, f) != v for f, v in values.items()):
+            AuthorStats.objects.filter(author_id=author_id).update(**values)
+        else:
+            continue
+        fixed += 1
+    return fixed
+
+
+def recount_posts(post_ids):
+    """Сверяет счетчики комментариев, возвращает число исправленных."""
+    actual = dict(
+        Comment.objects.filter(post_id__in=post_ids).values_list(
+            'post_id'
+        ).annotate(count=Count('id'))
+    )
+    fixed = 0
+    for post_id, comments_count in Post.objects.filter(
+        pk__in=post_ids
+    ).values_list('pk', 'comments_count'):
+        if comments_count != actual.get(post_id, 0):
+            Post.objects.filter(pk=post_id).update(
+                comments_count=actual.get(post_id, 0)
+            )
+            forget(Post, post_id)
+            fixed += 1
+    return fixed
@@ -0,0 +1,245 @@
+import json
+import logging
+from collections import Counter
+
+from django.db.models import OuterRef, Q, Subquery
+
+from core.jobs import task
+from core.models import Job
+from core.sqlite.transaction import atomic_write
+from posts.heads import HeadCursorPaginator, get_head, merged_entries
+from posts.hydration import hydrate_posts
+from posts.models import AuthorStats, FeedEntry, Follow, Post
+from posts.utils import MergedCursorPaginator, get_page
+from yatube.settings import (FEED_LENGTH, FEED_PULL_THRESHOLD,
+                             FEED_PUSH_THRESHOLD, POST_COUNT)
+
+FAN_OUT_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def feed_mode(author_id):
+    """(число подписчиков, читаются ли посты автора через pull)."""
+    return AuthorStats.objects.filter(author_id=author_id).values_list(
+        'followers_count', 'feed_pull'
+    ).first() or (0, False)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    followers, pull = feed_mode(post.author_id)
+    if pull or not followers:
+        return
+    follower_ids = list(
+        Follow.objects.filter(
+            author_id=post.author_id
+        ).values_list('user_id', flat=True)
+    )
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in follower_ids
+        ),
+        batch_size=FAN_OUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim_feeds(follower_ids)
+
+
+def follow_added(follow):
+    """Новая подписка: досыпаем ленту, у популярного автора
+    ставим в очередь переход в pull.
+
+    Счетчик подписчиков к этому моменту уже увеличен.
+    """
+    followers, pull = feed_mode(follow.author_id)
+    if pull:
+        return
+    backfill(follow.user, follow.author)
+    if followers >= FEED_PULL_THRESHOLD:
+        schedule_switch(follow.author_id)
+
+
+def follow_removed(follow):
+    """Отписка: чистим ленту, pull-автора, потерявшего подписчиков,
+    ставим в очередь на возврат в push.
+    """
+    followers, pull = feed_mode(follow.author_id)
+    if not pull:
+        remove_author(follow.user, follow.author)
+    elif followers < FEED_PUSH_THRESHOLD:
+        schedule_switch(follow.author_id)
+
+
+def schedule_switch(author_id):
+    """Ставит switch_feed_mode в очередь, если она там еще не стоит."""
+    queued = Job.objects.filter(
+        name=SWITCH_TASK, args=json.dumps([author_id]), status=Job.QUEUED
+    )
+    if not queued.exists():
+        switch_feed_mode.delay(author_id)
+
+
+@task
+def switch_feed_mode(author_id):
+    """Переводит автора между push и pull по числу подписчиков.
+
+    Переход в pull удаляет разложенные записи автора, возврат в push
+    раскладывает его последние посты всем подписчикам. Между
+    FEED_PUSH_THRESHOLD и FEED_PULL_THRESHOLD режим не меняется.
+    """
+    with atomic_write():
+        followers, pull = feed_mode(author_id)
+        if not pull and followers >= FEED_PULL_THRESHOLD:
+            AuthorStats.objects.filter(author_id=author_id).update(
+                feed_pull=True
+            )
+            FeedEntry.objects.filter(post__author_id=author_id).delete()
+        elif pull and followers < FEED_PUSH_THRESHOLD:
+            for user_follow in Follow.objects.filter(
+                author_id=author_id
+            ).select_related('user', 'author'):
+                backfill(user_follow.user, user_follow.author)
+            AuthorStats.objects.filter(author_id=author_id).update(
+                feed_pull=False
+            )
+        else:
+            return False
+    return True
+
+
+SWITCH_TASK = f'{switch_feed_mode.__module__}.{switch_feed_mode.__name__}'
+
+
+def backfill(user, author):
+    """Добавляет в ленту подписчика последние посты нового автора."""
+    posts = Post.objects.filter(author=author).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:FEED_LENGTH]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user=user, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ),
+        batch_size=FAN_OUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim_feeds([user.pk])
+
+
+def remove_author(user, author):
+    """Убирает из ленты посты автора, от которого пользователь отписался."""
+    FeedEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def settle_feed_modes():
+    """Выставляет режим всем авторам по счетчикам, как switch_feed_mode.
+
+    Ленты после этого надо пересобрать: rebuild_feed.
+    """
+    AuthorStats.objects.filter(
+        followers_count__gte=FEED_PULL_THRESHOLD
+    ).update(feed_pull=True)
+    AuthorStats.objects.filter(
+        followers_count__lt=FEED_PUSH_THRESHOLD
+    ).update(feed_pull=False)
+
+
+def rebuild_feed(user):
+    """Пересобирает ленту пользователя по его текущим подпискам."""
+    FeedEntry.objects.filter(user=user).delete()
+    posts = Post.objects.filter(
+        Q(author__stats__isnull=True) | Q(author__stats__feed_pull=False),
+        author__following__user=user,
+    ).order_by('-pub_date', '-id').values_list('id', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user=user, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts[:FEED_LENGTH]
+        ),
+        batch_size=FAN_OUT_BATCH_SIZE,
+    )
+
+
+def trim_feeds(user_ids):
+    """Оставляет в каждой ленте не больше FEED_LENGTH последних записей.
+
+    Граница — ключ (pub_date, post_id) записи номер FEED_LENGTH, как
+    в курсоре: при равном времени публикации лишние записи тоже
+    удаляются. Ключ ищется коррелированными подзапросами по индексу
+    (user, -pub_date, -post), поэтому ленты обрезаются одним DELETE
+    на пачку подписчиков.
+    """
+    boundary = FeedEntry.objects.filter(
+        user_id=OuterRef('user_id')
+    ).order_by('-pub_date', '-post_id')[FEED_LENGTH - 1:FEED_LENGTH]
+    boundary_date = Subquery(boundary.values('pub_date'))
+    boundary_post = Subquery(boundary.values('post_id'))
+    for start in range(0, len(user_ids), FAN_OUT_BATCH_SIZE):
+        FeedEntry.objects.filter(
+            Q(pub_date__lt=boundary_date)
+            | Q(pub_date=boundary_date, post_id__lt=boundary_post),
+            user_id__in=user_ids[start:start + FAN_OUT_BATCH_SIZE],
+        ).delete()
+
+
+def follow_streams(user):
+    """Потоки ленты подписок: разложенные записи и посты pull-авторов."""
+    streams = {
+        'push': (
+            FeedEntry.objects.filter(user=user),
+            ('pub_date', 'post_id'),
+        ),
+    }
+    pull_author_ids = list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__feed_pull=True,
+        ).values_list('author_id', flat=True)
+    )
+    if pull_author_ids:
+        streams['pull'] = (
+            Post.objects.filter(author_id__in=pull_author_ids).for_feed(),
+            ('pub_date', 'id'),
+        )
+    return streams
+
+
+def follow_page(request, version):
+    """Страница ленты подписок, слитая из push- и pull-потоков.
+
+    Начало ленты читается из упакованной головы версии version.
+    В page_obj.feed_sources остается, сколько постов страницы
+    пришло из каждого потока.
+    """
+    streams = follow_streams(request.user)
+    head = get_head(
+        f'follow:{request.user.pk}', version, merged_entries(streams)
+    )
+    page_obj = get_page(
+        HeadCursorPaginator(
+            head, MergedCursorPaginator(streams, POST_COUNT)
+        ),
+        request,
+    )
+    page_obj.feed_sources = Counter(row.feed_source for row in page_obj)
+    # Посты из разложенных записей собираются из кэша объектов.
+    pushed = {
+        post.pk: post
+        for post in hydrate_posts(
+            row.post_id for row in page_obj if isinstance(row, FeedEntry)
+        )
+    }
+    posts = []
+    for row in page_obj:
+        if not isinstance(row, FeedEntry):
+            posts.append(row)
+        elif row.post_id in pushed:
+            posts.append(pushed[row.post_id])
+    page_obj.object_list = posts
+    logger.info(
+        'follow feed page for %s served by %s',
+        request.user, dict(page_obj.feed_sources),
+    )
+    return page_obj
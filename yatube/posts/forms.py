@@ -18,6 +18,23 @@ class PostForm(forms.ModelForm):
             'image': 'Выберите изображение'
         }
 
+    def clean(self):
+        """Запоминает размеры загруженного изображения.
+
+        Pillow уже открыл файл при проверке поля, так что размеры
+        берутся из него без повторного чтения. Миниатюры новой
+        картинки создаются после сохранения в фоне.
+        """
+        cleaned_data = super().clean()
+        if 'image' in self.changed_data:
+            image = getattr(cleaned_data.get('image'), 'image', None)
+            self.instance.image_width, self.instance.image_height = (
+                image.size if image is not None else (None, None)
+            )
+            # Миниатюры старой картинки больше не подходят.
+            self.instance.thumbnails = ''
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
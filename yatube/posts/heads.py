@@ -0,0 +1,191 @@
+"""Головы лент в упакованном виде: только время публикации и id.
+
+Кэшировать страницы ленты списками моделей дорого: каждая
+страница каждого пользователя — отдельный pickle с постами,
+авторами и группами. Голова ленты хранит первые FEED_HEAD_LENGTH
+записей парами 64-битных чисел в одном array('q'), то есть
+16 байт на пост. Курсор ищется двоичным поиском прямо по буферу,
+а посты страницы собираются из кэша объектов (posts.hydration).
+
+Головы лежат в отдельном кэше 'feeds' с пределом MAX_BYTES,
+поэтому головы всех активных лент укладываются в заданный объем.
+"""
+import datetime as dt
+import heapq
+from array import array
+from itertools import islice
+
+from django.core.cache import caches
+from django.core.paginator import Paginator
+
+from core.routers import primary_reads
+from posts.hydration import hydrate_posts
+from posts.utils import CursorPaginator
+from yatube.settings import FEED_HEAD_LENGTH, FEED_HEAD_TIMEOUT
+
+HEAD_KEY = 'head:{}:{}'
+EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+
+
+def to_micros(value):
+    return (value - EPOCH) // dt.timedelta(microseconds=1)
+
+
+class FeedHead:
+    """Первые записи ленты от новых к старым.
+
+    keys — array('q') с парами (микросекунды pub_date, id),
+    sources — по байту на запись с номером потока в names.
+    complete — в голову попала вся лента, и за ее концом
+    в базу идти не нужно.
+    """
+
+    def __init__(self, keys, sources, names, complete):
+        self.keys = keys
+        self.sources = sources
+        self.names = names
+        self.complete = complete
+
+    @classmethod
+    def build(cls, entries, limit):
+        """Голова из записей (pub_date, id, поток) от новых к старым."""
+        rows = list(islice(entries, limit + 1))
+        keys = array('q')
+        sources = bytearray()
+        names = []
+        for pub_date, pk, source in rows[:limit]:
+            if source not in names:
+                names.append(source)
+            keys.extend((to_micros(pub_date), pk))
+            sources.append(names.index(source))
+        return cls(keys, bytes(sources), tuple(names), len(rows) <= limit)
+
+    def __getstate__(self):
+        return self.keys.tobytes(), self.sources, self.names, self.complete
+
+    def __setstate__(self, state):
+        packed, self.sources, self.names, self.complete = state
+        self.keys = array('q')
+        self.keys.frombytes(packed)
+
+    def __len__(self):
+        return len(self.keys) // 2
+
+    def key(self, index):
+        return self.keys[2 * index], self.keys[2 * index + 1]
+
+    def newer_than(self, anchor):
+        """Сколько записей головы новее anchor = (микросекунды, id)."""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle) > anchor:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def slice(self, anchor, backwards, limit):
+        """Записи (id, поток) страницы так же, как CursorPaginator.fetch.
+
+        None, если страница выходит за конец неполной головы.
+        """
+        if anchor is None:
+            start = 0
+        else:
+            value, pk = anchor
+            micros = to_micros(value)
+            start = self.newer_than((micros, pk))
+            if start == len(self) and not self.complete:
+                # anchor за концом головы: между ними могут быть посты.
+                return None
+            if backwards:
+                return self.entries(max(start - limit, 0), start)
+            if start < len(self) and self.key(start) == (micros, pk):
+                start += 1
+        end = start + limit
+        if end > len(self) and not self.complete:
+            return None
+        return self.entries(start, min(end, len(self)))
+
+    def entries(self, start, end):
+        return [
+            (self.keys[2 * index + 1], self.names[self.sources[index]])
+            for index in range(start, end)
+        ]
+
+
+def get_head(name, version, entries):
+    """Голова ленты name из кэша или собранная из entries(limit)."""
+    head_cache = caches['feeds']
+    key = HEAD_KEY.format(name, version)
+    head = head_cache.get(key)
+    if head is None:
+        with primary_reads():
+            head = FeedHead.build(
+                entries(FEED_HEAD_LENGTH + 1), FEED_HEAD_LENGTH
+            )
+        head_cache.set(key, head, FEED_HEAD_TIMEOUT)
+    return head
+
+
+def queryset_entries(queryset, keys=('pub_date', 'id'), source=None):
+    """entries для головы из queryset: limit ключей, без моделей."""
+    def entries(limit):
+        rows = queryset.order_by(
+            *(f'-{key}' for key in keys)
+        ).values_list(*keys)[:limit]
+        return ((pub_date, pk, source) for pub_date, pk in rows)
+    return entries
+
+
+def merged_entries(streams):
+    """entries для головы из потоков MergedCursorPaginator."""
+    def entries(limit):
+        return islice(heapq.merge(
+            *(
+                queryset_entries(queryset, keys, name)(limit)
+                for name, (queryset, keys) in streams.items()
+            ),
+            key=lambda entry: entry[:2],
+            reverse=True,
+        ), limit)
+    return entries
+
+
+class HeadCursorPaginator(CursorPaginator):
+    """Курсорный вывод ленты по голове, дальше нее — через fallback.
+
+    Строки из головы — посты с атрибутами feed_source и feed_key,
+    как у MergedCursorPaginator; курсоры у обоих путей одинаковые.
+    """
+
+    def __init__(self, head, fallback):
+        self.head = head
+        self.fallback = fallback
+        Paginator.__init__(self, [], fallback.per_page)
+        self._number = 1
+        self._has_next = False
+
+    def get_legacy_page(self, number):
+        return self.fallback.get_legacy_page(number)
+
+    def fetch(self, anchor, backwards, limit):
+        entries = self.head.slice(anchor, backwards, limit)
+        if entries is None:
+            return self.fallback.fetch(anchor, backwards, limit)
+        posts = {
+            post.pk: post
+            for post in hydrate_posts(pk for pk, _ in entries)
+        }
+        rows = []
+        for pk, source in entries:
+            post = posts.get(pk)
+            if post is not None:
+                post.feed_source = source
+                post.feed_key = (post.pub_date, post.pk)
+                rows.append(post)
+        return rows
+
+    def key(self, row):
+        return self.fallback.key(row)
@@ -0,0 +1,70 @@
+"""Пользовательские «дырки» в общей для всех оболочке страницы.
+
+Оболочка страницы рендерится и кэшируется один раз для всех:
+на месте шапки, кнопки подписки и формы комментария в ней стоят
+маркеры. Для конкретного запроса маркеры заполняются маленькими
+шаблонами, которым не нужны запросы ленты.
+"""
+import base64
+import json
+import re
+
+from django.template.loader import render_to_string
+
+from posts.forms import CommentForm
+from posts.models import Follow
+
+MARKER = '<!--hole:{}:{}-->'
+# Пользовательский текст экранируется, поэтому «<» в нем не встретится
+# и подделать маркер из поста или комментария нельзя.
+MARKER_RE = re.compile(r'<!--hole:([\w-]+):([\w=-]*)-->')
+
+
+def follow_button(request, author):
+    return {
+        'author': author,
+        'is_self': request.user.username == author,
+        'following': request.user.is_authenticated and Follow.objects.filter(
+            user=request.user, author__username=author
+        ).exists(),
+    }
+
+
+def post_actions(request, post_id, author):
+    return {
+        'post_id': post_id,
+        'is_author': request.user.username == author,
+        'form': CommentForm(),
+    }
+
+
+# Имя дырки: шаблон и функция, досчитывающая контекст по запросу.
+HOLES = {
+    'header': ('includes/header.html', None),
+    'switcher': ('posts/includes/switcher.html', None),
+    'follow_button': ('posts/includes/follow_button.html', follow_button),
+    'post_actions': ('posts/includes/post_actions.html', post_actions),
+}
+
+
+def render_hole(request, name, args):
+    template_name, get_context = HOLES[name]
+    context = dict(args)
+    if get_context is not None:
+        context.update(get_context(request, **args))
+    return render_to_string(template_name, context, request=request)
+
+
+def marker(name, args):
+    encoded = base64.urlsafe_b64encode(json.dumps(args).encode()).decode()
+    return MARKER.format(name, encoded)
+
+
+def fill(content, request):
+    """Подставляет в оболочку дырки, отрендеренные для request."""
+    def replace(match):
+        name, encoded = match.groups()
+        args = json.loads(base64.urlsafe_b64decode(encoded))
+        return render_hole(request, name, args)
+
+    return MARKER_RE.sub(replace, content)
@@ -0,0 +1,131 @@
+"""Превращение списка id в загруженные посты с авторами и группами.
+
+Каждый Post, User и Group лежит в кэше отдельной записью. Список
+id собирается одним get_many на модель, недостающие объекты
+выбираются одним запросом IN и сразу пишутся обратно в кэш.
+Записи сбрасывает forget(): сигналы при сохранении и удалении,
+а код, меняющий строки через update(), вызывает его сам.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.http import Http404
+
+from core.routers import primary_reads
+from posts.models import Group, Post
+from yatube.settings import HYDRATION_TIMEOUT
+
+User = get_user_model()
+
+OBJECT_KEY = 'object:{}:{}'
+# Поля, которые попадают в общий кэш. Карточке автора нужны только
+# имена, а хэш пароля, почта и права в кэше лежать не должны.
+# Модели без списка кэшируются целиком.
+CACHED_FIELDS = {
+    User: ('id', 'username', 'first_name', 'last_name'),
+}
+
+
+def object_key(model, pk):
+    return OBJECT_KEY.format(model._meta.label_lower, pk)
+
+
+def dump(instance):
+    """Значения полей без связанных объектов: они кэшируются отдельно."""
+    names = CACHED_FIELDS.get(type(instance))
+    if names is None:
+        names = [field.attname for field in instance._meta.concrete_fields]
+    return {name: getattr(instance, name) for name in names}
+
+
+def load(model, values):
+    # Полей, добавленных после записи в кэш, в values нет:
+    # они станут отложенными и догрузятся при обращении.
+    return model.from_db(
+        router.db_for_read(model), list(values), list(values.values())
+    )
+
+
+def hydrate(model, ids, queryset=None):
+    """Объекты model по списку id в том же порядке.
+
+    Промахи выбираются из queryset, по умолчанию из всех строк
+    модели. Удаленные id пропускаются, повторы сохраняются.
+    """
+    ids = list(ids)
+    keys = {pk: object_key(model, pk) for pk in ids}
+    found = cache.get_many(list(keys.values()))
+    objects = {
+        pk: load(model, found[key])
+        for pk, key in keys.items() if key in found
+    }
+    missing = [pk for pk in keys if pk not in objects]
+    if missing:
+        if queryset is None:
+            queryset = model._base_manager.all()
+        with primary_reads():
+            fetched = queryset.in_bulk(missing)
+        objects.update(fetched)
+        remember(*fetched.values())
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+def remember(*instances):
+    """Кладет в кэш объекты, уже загруженные из базы."""
+    cache.set_many(
+        {
+            object_key(type(instance), instance.pk): dump(instance)
+            for instance in instances
+        },
+        HYDRATION_TIMEOUT,
+    )
+
+
+def hydrate_posts(ids):
+    """Посты по списку id с подставленными author и group.
+
+    Промахи выбираются одним запросом for_detail(): авторы и группы
+    из его JOIN тоже кладутся в кэш, а не выбираются отдельно.
+    """
+    posts = hydrate(Post, ids, Post.objects.for_detail())
+    joined = [post for post in posts if Post.author.is_cached(post)]
+    remember(
+        *{post.author for post in joined},
+        *{post.group for post in joined if post.group_id},
+    )
+    authors = {post.author_id: post.author for post in joined}
+    groups = {post.group_id: post.group for post in joined}
+    authors.update(
+        (user.pk, user) for user in hydrate(User, {
+            post.author_id for post in posts
+            if post.author_id not in authors
+        })
+    )
+    groups.update(
+        (group.pk, group) for group in hydrate(Group, {
+            post.group_id for post in posts
+            if post.group_id and post.group_id not in groups
+        })
+    )
+    hydrated = []
+    for post in posts:
+        if post.author_id not in authors:
+            continue
+        post.author = authors[post.author_id]
+        # Удаление группы обнуляет group_id через update(),
+        # поэтому в кэше поста может остаться id удаленной группы.
+        post.group = groups.get(post.group_id)
+        hydrated.append(post)
+    return hydrated
+
+
+def get_post_or_404(pk):
+    posts = hydrate_posts([pk])
+    if not posts:
+        raise Http404('No Post matches the given query.')
+    return posts[0]
+
+
+def forget(model, *ids):
+    """Сбрасывает закэшированные объекты model с этими id."""
+    cache.delete_many([object_key(model, pk) for pk in ids])
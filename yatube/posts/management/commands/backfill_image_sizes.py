@@ -0,0 +1,74 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from core.jobs import before_fork
+from posts.cache import bump
+from posts.hydration import forget
+from posts.models import Post
+
+
+def read_size(name):
+    """Размеры изображения из хранилища или None, если файл не читается."""
+    try:
+        with default_storage.open(name) as image_file:
+            return Image.open(image_file).size
+    except (OSError, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры изображений у постов, где их еще нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=None,
+            help='Число процессов (по умолчанию по числу ядер).'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько постов обрабатывать за один проход.'
+        )
+
+    def handle(self, *args, **options):
+        pending = Post.objects.exclude(image='').filter(
+            image_width__isnull=True
+        ).order_by('pk')
+        updated = failed = 0
+        scopes = {'posts'}
+        last_pk = 0
+        before_fork()
+        with ProcessPoolExecutor(options['processes']) as executor:
+            while True:
+                chunk = pending.filter(pk__gt=last_pk).only(
+                    'pk', 'image', 'author_id', 'group_id'
+                )
+                posts = list(chunk[:options['chunk_size']])
+                if not posts:
+                    break
+                last_pk = posts[-1].pk
+                sizes = executor.map(
+                    read_size, [post.image.name for post in posts]
+                )
+                ready = []
+                for post, size in zip(posts, sizes):
+                    if size is None:
+                        failed += 1
+                        continue
+                    post.image_width, post.image_height = size
+                    ready.append(post)
+                    scopes.update(
+                        (f'user:{post.author_id}', f'group:{post.group_id}')
+                    )
+                Post.objects.bulk_update(
+                    ready, ['image_width', 'image_height']
+                )
+                forget(Post, *(post.pk for post in ready))
+                updated += len(ready)
+        # Фрагменты лент с этими постами перестраиваются с новой версткой.
+        bump(*scopes)
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено: {updated}, не удалось прочитать: {failed}'
+        ))
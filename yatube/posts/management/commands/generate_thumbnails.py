@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь миниатюры для постов, у которых их еще нет.'
+
+    def handle(self, *args, **options):
+        pending = Post.objects.exclude(image='').filter(
+            thumbnails=''
+        ).order_by('pk').values_list('pk', 'image')
+        count = 0
+        for pk, name in pending.iterator():
+            generate.delay(pk, name)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Поставлено в очередь: {count}. Запустите manage.py runworker.'
+        ))
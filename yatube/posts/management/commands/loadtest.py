@@ -0,0 +1,294 @@
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote, urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from core.jobs import before_fork
+from core.loadtest import (HTTPDriver, Recorder, WSGIDriver, load_baseline,
+                           regressions, save_baseline, summarize)
+from core.queries import flush_stats
+from core.sqlite.gate import gate_stats
+from posts.models import Group, Post
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x01\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+# Сколько id выбирать из базы для сценариев.
+SAMPLE_SIZE = 1000
+# Последняя ссылка пагинатора — на следующую страницу. Курсор в ссылке
+# закодирован для URL, поэтому берется целиком до конца параметра.
+CURSOR_LINK = re.compile(rb'\?cursor=([^"&]+)')
+
+
+def browse(driver, rng, sample):
+    """Главная и пара следующих страниц по курсору."""
+    _, body = driver.get('posts:index')
+    for _ in range(rng.randint(0, 2)):
+        cursors = CURSOR_LINK.findall(body)
+        if not cursors:
+            break
+        cursor = unquote(cursors[-1].decode())
+        _, body = driver.get(
+            'posts:index', query=f'?{urlencode({"cursor": cursor})}'
+        )
+    if sample['groups']:
+        driver.get('posts:group_list', rng.choice(sample['groups']))
+
+
+def read_post(driver, rng, sample):
+    driver.get('posts:post_detail', rng.choice(sample['posts']))
+    driver.get('posts:profile', rng.choice(sample['usernames']))
+
+
+def comment(driver, rng, sample):
+    post_id = rng.choice(sample['posts'])
+    driver.get('posts:post_detail', post_id)
+    driver.post(
+        'posts:add_comment', post_id,
+        data={'text': f'Нагрузочный комментарий {rng.random()}'},
+        expect=302,
+    )
+
+
+def follow(driver, rng, sample):
+    username = rng.choice(sample['usernames'])
+    driver.get('posts:profile', username)
+    driver.get('posts:profile_follow', username, expect=302)
+
+
+def follow_feed(driver, rng, sample):
+    driver.get('posts:follow_index')
+
+
+def create_post(driver, rng, sample):
+    driver.get('posts:post_create')
+    driver.post(
+        'posts:post_create',
+        data={'text': f'Нагрузочный пост {rng.random()}'},
+        files={'image': ('load.gif', SMALL_GIF, 'image/gif')},
+        expect=302,
+    )
+
+
+# Сценарии и их доли в прогоне.
+JOURNEYS = {
+    'browse': (browse, 40),
+    'read_post': (read_post, 25),
+    'follow_feed': (follow_feed, 15),
+    'comment': (comment, 10),
+    'follow': (follow, 5),
+    'create_post': (create_post, 5),
+}
+
+
+def run_user(number, options, sample, recorder):
+    """Один виртуальный пользователь: сценарии до конца прогона."""
+    rng = random.Random(f'{options["seed"]}:{os.getpid()}:{number}')
+    user = User.objects.get(pk=rng.choice(sample['users']))
+    if options['url']:
+        driver = HTTPDriver(recorder, options['url'], user)
+    else:
+        from yatube.wsgi import application
+        driver = WSGIDriver(recorder, application, user)
+    journeys = [JOURNEYS[name] for name in options['journeys']]
+    functions = [function for function, _ in journeys]
+    weights = [weight for _, weight in journeys]
+    deadline = time.monotonic() + options['duration']
+    done = 0
+    while time.monotonic() < deadline:
+        if options['iterations'] and done >= options['iterations']:
+            break
+        rng.choices(functions, weights)[0](driver, rng, sample)
+        done += 1
+
+
+def run_thread(*args):
+    try:
+        run_user(*args)
+    finally:
+        connections.close_all()
+
+
+def run_process(first, options, sample):
+    """Потоки одного процесса; возвращает общий Recorder."""
+    recorder = Recorder()
+    if options['threads'] == 1:
+        run_user(first, options, sample, recorder)
+    else:
+        threads = [
+            threading.Thread(
+                target=run_thread,
+                args=(first + number, options, sample, recorder),
+            )
+            for number in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    # Сводка запросов копится в процессе: без сброса query_report
+    # не увидит короткий прогон.
+    flush_stats()
+    return recorder
+
+
+RUN_OPTIONS = (
+    'threads', 'processes', 'duration', 'iterations', 'journeys', 'seed',
+    'url', 'save_baseline', 'baseline', 'threshold',
+)
+
+
+def journey_names(value):
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = set(names) - set(JOURNEYS)
+    if unknown:
+        raise CommandError(f'Нет сценариев: {", ".join(sorted(unknown))}')
+    return names
+
+
+class Command(BaseCommand):
+    help = (
+        'Гоняет сценарии пользователей по засеянной базе (см. seed) '
+        'и выводит пропускную способность и p50/p95/p99 по имени URL. '
+        'Без --url запросы идут прямо в yatube.wsgi.application; '
+        'для честных цифр запускайте с DEBUG = False.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help='Длительность прогона в секундах.'
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=0,
+            help='Сценариев на пользователя (0 — пока идет время).'
+        )
+        parser.add_argument(
+            '--journeys', type=journey_names, default=list(JOURNEYS),
+            help=f'Через запятую из: {", ".join(JOURNEYS)}.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--url', default='',
+            help='Адрес запущенного сервера, например http://127.0.0.1:8000.'
+        )
+        parser.add_argument(
+            '--save-baseline', metavar='PATH',
+            help='Сохранить результат как эталон в JSON.'
+        )
+        parser.add_argument(
+            '--baseline', metavar='PATH',
+            help='Сравнить результат с эталоном из JSON.'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимое ухудшение p95 и запросов/с, доля от эталона.'
+        )
+
+    def handle(self, *args, **options):
+        sample = self.sample()
+        # В процессы уходят только параметры прогона, без stdout.
+        options = {name: options[name] for name in RUN_OPTIONS}
+        baseline = None
+        if options['baseline']:
+            baseline = load_baseline(options['baseline'])
+        start = time.monotonic()
+        if options['processes'] > 1:
+            before_fork()
+            recorder = Recorder()
+            with ProcessPoolExecutor(options['processes']) as executor:
+                for result in executor.map(
+                    run_process,
+                    [
+                        number * options['threads']
+                        for number in range(options['processes'])
+                    ],
+                    [options] * options['processes'],
+                    [sample] * options['processes'],
+                ):
+                    recorder.merge(result)
+        else:
+            recorder = run_process(0, options, sample)
+        summary = summarize(recorder, time.monotonic() - start)
+        self.print_summary(summary)
+        if not options['url'] and options['processes'] == 1:
+            # Очередь записи своя у процесса: видна, только когда
+            # сервер работает здесь же.
+            for name, stats in gate_stats().items():
+                if not stats['acquired']:
+                    continue
+                self.stdout.write(
+                    f'Очередь записи {name}: {stats["contended"]} '
+                    f'из {stats["acquired"]} ждали, максимум '
+                    f'{stats["wait_max_ms"]} мс, таймаутов {stats["timeouts"]}'
+                )
+        if options['save_baseline']:
+            save_baseline(options['save_baseline'], summary, {
+                'created': timezone.now().isoformat(),
+                'target': options['url'] or 'wsgi',
+                'threads': options['threads'],
+                'processes': options['processes'],
+                'journeys': options['journeys'],
+            })
+            self.stdout.write(f'Эталон записан: {options["save_baseline"]}')
+        if baseline is not None:
+            found = regressions(summary, baseline, options['threshold'])
+            if found:
+                raise CommandError(
+                    'Хуже эталона:\n' + '\n'.join(found)
+                )
+            self.stdout.write(self.style.SUCCESS('Не хуже эталона'))
+
+    def sample(self):
+        """Id и имена для сценариев; база должна быть засеяна."""
+        users = list(
+            User.objects.filter(is_active=True)
+            .order_by('?').values_list('pk', 'username')[:SAMPLE_SIZE]
+        )
+        # Читают в основном свежие посты, а сортировка всей таблицы
+        # по random() на миллионах строк заняла бы заметное время.
+        posts = list(
+            Post.objects.order_by('-pk')
+            .values_list('pk', flat=True)[:SAMPLE_SIZE]
+        )
+        if not users or not posts:
+            raise CommandError(
+                'В базе нет пользователей или постов, запустите seed.'
+            )
+        return {
+            'users': [pk for pk, _ in users],
+            'usernames': [username for _, username in users],
+            'posts': posts,
+            'groups': list(
+                Group.objects.values_list('slug', flat=True)[:SAMPLE_SIZE]
+            ),
+        }
+
+    def print_summary(self, summary):
+        self.stdout.write(
+            f'{"URL":<28}{"запросов":>10}{"ошибок":>8}{"в сек":>9}'
+            f'{"p50":>9}{"p95":>9}{"p99":>9}'
+        )
+        for name, row in summary.items():
+            self.stdout.write(
+                f'{name:<28}{row["count"]:>10}{row["errors"]:>8}'
+                f'{row["rps"]:>9}{row["p50"]:>9}{row["p95"]:>9}'
+                f'{row["p99"]:>9}'
+            )
@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.feeds import rebuild_feed, settle_feed_modes, trim_feeds
+
+User = get_user_model()
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Чьи ленты пересобрать (по умолчанию все).'
+        )
+        parser.add_argument(
+            '--trim-only', action='store_true',
+            help='Только обрезать ленты до FEED_LENGTH записей.'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        user_ids = list(users.order_by('pk').values_list('pk', flat=True))
+        if not options['trim_only'] and not options['usernames']:
+            # Режим авторов меняется только вместе со всеми лентами.
+            settle_feed_modes()
+        for start in range(0, len(user_ids), CHUNK_SIZE):
+            chunk = user_ids[start:start + CHUNK_SIZE]
+            if options['trim_only']:
+                trim_feeds(chunk)
+                continue
+            for user in User.objects.filter(pk__in=chunk):
+                rebuild_feed(user)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано лент: {len(user_ids)}'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов.'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError('Полнотекстовый поиск есть только в SQLite.')
+        search.install_triggers()
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Индекс поиска перестроен'))
@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_authors, recount_posts
+from posts.models import Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счетчики с таблицами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько строк сверять за один проход.'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        fixed_authors = self.recount(User, recount_authors, chunk_size)
+        fixed_posts = self.recount(Post, recount_posts, chunk_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено авторов: {fixed_authors}, постов: {fixed_posts}'
+        ))
+
+    def recount(self, model, recount_chunk, chunk_size):
+        """Идет по первичному ключу порциями, не держа все id в памяти."""
+        fixed = 0
+        last_pk = 0
+        while True:
+            chunk = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not chunk:
+                return fixed
+            fixed += recount_chunk(chunk)
+            last_pk = chunk[-1]
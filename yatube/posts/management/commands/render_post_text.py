@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from posts.hydration import forget
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заполняет text_html и excerpt у постов, где их еще нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько постов обрабатывать за один проход.'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать все посты, например после смены разметки.'
+        )
+
+    def handle(self, *args, **options):
+        pending = Post.objects.order_by('pk')
+        if not options['all']:
+            pending = pending.filter(text_html='')
+        updated = 0
+        last_pk = 0
+        while True:
+            posts = list(
+                pending.filter(pk__gt=last_pk).only('pk', 'text')
+                [:options['chunk_size']]
+            )
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+            for post in posts:
+                post.render_text()
+            Post.objects.bulk_update(posts, ['text_html', 'excerpt'])
+            forget(Post, *(post.pk for post in posts))
+            updated += len(posts)
+        # Разметка та же, что давал linebreaks в шаблоне,
+        # поэтому кэш фрагментов сбрасывать не нужно.
+        self.stdout.write(self.style.SUCCESS(f'Заполнено: {updated}'))
@@ -0,0 +1,386 @@
+import bisect
+import datetime as dt
+import io
+import itertools
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from core.jobs import before_fork
+from core.sqlite.transaction import atomic_write
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SUFFIXES = {'k': 10 ** 3, 'm': 10 ** 6}
+# Показатель степенного закона: чем больше, тем сильнее перекос.
+ZIPF_EXPONENT = 1.1
+# Средний пост пишется в серии из стольких постов.
+BURST_SIZE = 20
+BURST_SECONDS = 3600
+
+
+def count(value):
+    """'100k', '10M' или просто число."""
+    value = value.strip().lower()
+    multiplier = SUFFIXES.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    try:
+        return int(float(value) * multiplier)
+    except ValueError:
+        raise CommandError(f'Не число: {value}')
+
+
+@lru_cache(maxsize=None)
+def zipf_weights(size):
+    """Накопленные веса рангов 1..size по степенному закону.
+
+    Считаются один раз на процесс: для 10M постов это 80 МБ.
+    """
+    return array('d', itertools.accumulate(
+        1 / rank ** ZIPF_EXPONENT for rank in range(1, size + 1)
+    ))
+
+
+def pick(rng, cum_weights):
+    """Индекс по накопленным весам, как random.choices, но без списков."""
+    return bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+def chunk_rng(seed, kind, index):
+    """Свой генератор на каждую пачку: результат не зависит от того,
+    в каком процессе и в каком порядке пачки посчитаны.
+    """
+    rng = random.Random(f'{seed}:{kind}:{index}')
+    fake = Faker('ru_RU')
+    fake.seed_instance(f'{seed}:{kind}:{index}')
+    return rng, fake
+
+
+def make_users(seed, index, size, first):
+    rng, fake = chunk_rng(seed, 'users', index)
+    return [
+        (f'seed{first + offset}', fake.first_name(), fake.last_name())
+        for offset in range(size)
+    ]
+
+
+def make_follows(seed, index, users, per_user, authors):
+    """Подписки пачки пользователей: авторы по степенному закону."""
+    rng, _ = chunk_rng(seed, 'follows', index)
+    weights = zipf_weights(authors)
+    rows = []
+    for user in users:
+        wanted = min(int(rng.expovariate(1 / per_user)), authors - 1)
+        chosen = {pick(rng, weights) for _ in range(wanted)}
+        chosen.discard(user)
+        rows.extend((user, author) for author in sorted(chosen))
+    return rows
+
+
+def make_posts(seed, index, size, scale):
+    """Посты пачки: авторы и группы с перекосом, время — сериями."""
+    rng, fake = chunk_rng(seed, 'posts', index)
+    author_weights = zipf_weights(scale['users'])
+    group_weights = zipf_weights(scale['groups'])
+    start, window = scale['start'], scale['window']
+    rows = []
+    for _ in range(size):
+        # Серия — момент, вокруг которого один автор пишет несколько
+        # постов подряд; у каждой серии свой генератор.
+        burst = rng.randrange(max(scale['posts'] // BURST_SIZE, 1))
+        burst_rng = random.Random(f'{seed}:burst:{burst}')
+        moment = start + window * burst_rng.random()
+        moment += rng.expovariate(1 / BURST_SECONDS)
+        author = pick(burst_rng, author_weights)
+        group = None
+        if group_weights and rng.random() < 0.6:
+            group = pick(rng, group_weights)
+        text = fake.text(max_nb_chars=rng.choice((80, 200, 600, 2000)))
+        rows.append((author, group, min(moment, start + window), text))
+    return rows
+
+
+def make_comments(seed, index, size, scale):
+    rng, fake = chunk_rng(seed, 'comments', index)
+    post_weights = zipf_weights(scale['posts'])
+    start, window = scale['start'], scale['window']
+    return [
+        (
+            pick(rng, post_weights),
+            rng.randrange(scale['users']),
+            start + window * rng.random(),
+            fake.sentence(nb_words=rng.randint(3, 25)),
+        )
+        for _ in range(size)
+    ]
+
+
+def fake_image(rng, name):
+    width, height = rng.choice(((800, 600), (600, 900), (1024, 1024)))
+    buffer = io.BytesIO()
+    Image.new(
+        'RGB', (width, height),
+        tuple(rng.randrange(256) for _ in range(3)),
+    ).save(buffer, 'PNG')
+    return default_storage.save(name, ContentFile(buffer.getvalue())), (
+        width, height
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными для нагрузочных замеров: '
+        'seed --users 100k --posts 10M --follows 5M --comments 20M '
+        '--groups 1k.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=count, default=1000)
+        parser.add_argument('--groups', type=count, default=20)
+        parser.add_argument('--posts', type=count, default=10000)
+        parser.add_argument('--follows', type=count, default=5000)
+        parser.add_argument('--comments', type=count, default=20000)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора: одинаковое зерно — одинаковые данные.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней раскидать посты.'
+        )
+        parser.add_argument(
+            '--end', type=dt.date.fromisoformat, default=None,
+            help='Последний день постов, ГГГГ-ММ-ДД (по умолчанию сегодня).'
+        )
+        parser.add_argument(
+            '--images', type=float, default=0,
+            help='Доля постов с картинкой, от 0 до 1.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Сколько процессов генерирует данные.'
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith='seed').exists():
+            raise CommandError(
+                'В базе уже есть сгенерированные данные, '
+                'начните с пустой базы.'
+            )
+        self.options = options
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        window = dt.timedelta(days=options['days']).total_seconds()
+        end = dt.datetime.combine(
+            options['end'] or timezone.now().date(), dt.time(),
+            dt.timezone.utc,
+        )
+        # Масштаб и окно времени — все, что нужно генераторам в процессах.
+        self.scale = {
+            'users': options['users'],
+            'groups': options['groups'],
+            'posts': options['posts'],
+            'start': end.timestamp() - window,
+            'window': window,
+        }
+        self.executor = None
+        if options['processes'] > 1:
+            before_fork()
+            self.executor = ProcessPoolExecutor(options['processes'])
+        try:
+            self.user_ids = self.seed_users()
+            self.group_ids = self.seed_groups()
+            self.scale['users'] = len(self.user_ids)
+            self.scale['groups'] = len(self.group_ids)
+            if self.user_ids:
+                self.seed_follows()
+                self.post_ids = self.seed_posts()
+                self.scale['posts'] = len(self.post_ids)
+                if self.post_ids:
+                    self.seed_comments()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+        self.stdout.write('Пересчет счетчиков и лент...')
+        call_command('recount', stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+        # Кэши собраны по другим данным.
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        self.stdout.write(self.style.SUCCESS('Готово'))
+
+    def chunks(self, total):
+        for index, start in enumerate(range(0, total, self.batch_size)):
+            yield index, start, min(self.batch_size, total - start)
+
+    def map(self, func, *iterables):
+        if self.executor is None:
+            return map(func, *iterables)
+        return self.executor.map(func, *iterables)
+
+    def generate(self, func, total, *args):
+        """Пачки func(seed, index, size, *args) по порядку индексов."""
+        chunks = list(self.chunks(total))
+        return self.map(
+            func,
+            itertools.repeat(self.seed, len(chunks)),
+            [index for index, _, _ in chunks],
+            [size for _, _, size in chunks],
+            *(itertools.repeat(arg, len(chunks)) for arg in args),
+        )
+
+    def report(self, name, done):
+        self.stdout.write(f'{name}: {done}', ending='\r')
+
+    def seed_users(self):
+        password = make_password(None)
+        done = 0
+        for index, _, size in self.chunks(self.options['users']):
+            rows = make_users(self.seed, index, size, done)
+            User.objects.bulk_create(
+                User(
+                    username=username, first_name=first_name,
+                    last_name=last_name, password=password,
+                )
+                for username, first_name, last_name in rows
+            )
+            done += size
+            self.report('Пользователи', done)
+        self.stdout.write('')
+        return list(
+            User.objects.filter(username__startswith='seed')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def seed_groups(self):
+        rng, fake = chunk_rng(self.seed, 'groups', 0)
+        Group.objects.bulk_create(
+            (
+                Group(
+                    title=fake.catch_phrase()[:200], slug=f'seed-{index}',
+                    description=fake.paragraph(),
+                )
+                for index in range(self.options['groups'])
+            ),
+            batch_size=self.batch_size,
+        )
+        return list(
+            Group.objects.filter(slug__startswith='seed-')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def seed_follows(self):
+        users = len(self.user_ids)
+        if users < 2 or not self.options['follows']:
+            return
+        per_user = self.options['follows'] / users
+        user_chunks = [
+            list(range(start, start + size))
+            for _, start, size in self.chunks(users)
+        ]
+        done = 0
+        batches = self.map(
+            make_follows,
+            itertools.repeat(self.seed),
+            range(len(user_chunks)),
+            user_chunks,
+            itertools.repeat(per_user),
+            itertools.repeat(users),
+        )
+        for rows in batches:
+            Follow.objects.bulk_create(
+                (
+                    Follow(
+                        user_id=self.user_ids[user],
+                        author_id=self.user_ids[author],
+                    )
+                    for user, author in rows
+                ),
+                batch_size=self.batch_size,
+            )
+            done += len(rows)
+            self.report('Подписки', done)
+        self.stdout.write('')
+
+    def seed_posts(self):
+        total = self.options['posts']
+        rng = random.Random(f'{self.seed}:images')
+        done = 0
+        with auto_now_add_disabled(Post, 'pub_date'):
+            for rows in self.generate(make_posts, total, self.scale):
+                posts = []
+                for author, group, moment, text in rows:
+                    post = Post(
+                        author_id=self.user_ids[author],
+                        group_id=(
+                            None if group is None else self.group_ids[group]
+                        ),
+                        pub_date=dt.datetime.fromtimestamp(
+                            moment, dt.timezone.utc
+                        ),
+                        text=text,
+                    )
+                    post.render_text()
+                    if rng.random() < self.options['images']:
+                        post.image, (post.image_width, post.image_height) = (
+                            fake_image(rng, f'posts/seed_{done}.png')
+                        )
+                    posts.append(post)
+                    done += 1
+                with atomic_write():
+                    Post.objects.bulk_create(posts)
+                self.report('Посты', done)
+        self.stdout.write('')
+        return list(
+            Post.objects.filter(author_id__in=self.user_ids)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def seed_comments(self):
+        total = self.options['comments']
+        done = 0
+        with auto_now_add_disabled(Comment, 'created'):
+            for rows in self.generate(make_comments, total, self.scale):
+                Comment.objects.bulk_create(
+                    Comment(
+                        post_id=self.post_ids[post],
+                        author_id=self.user_ids[author],
+                        created=dt.datetime.fromtimestamp(
+                            moment, dt.timezone.utc
+                        ),
+                        text=text,
+                    )
+                    for post, author, moment, text in rows
+                )
+                done += len(rows)
+                self.report('Комментарии', done)
+        self.stdout.write('')
+
+
+class auto_now_add_disabled:
+    """Дает bulk_create записать свою дату вместо текущей."""
+
+    def __init__(self, model, name):
+        self.field = model._meta.get_field(name)
+
+    def __enter__(self):
+        self.field.auto_now_add = False
+
+    def __exit__(self, *exc_info):
+        self.field.auto_now_add = True
@@ -0,0 +1,57 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:57
+
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    comments = Comment.objects.values_list('post').annotate(
+        models.Count('id')
+    )
+    for post_id, count in comments:
+        Post.objects.filter(pk=post_id).update(comments_count=count)
+    posts = dict(
+        Post.objects.order_by().values_list('author').annotate(
+            models.Count('id')
+        )
+    )
+    following = dict(
+        Follow.objects.values_list('user').annotate(models.Count('id'))
+    )
+    for author_id in set(posts) | set(following):
+        AuthorStats.objects.update_or_create(
+            author_id=author_id,
+            defaults={
+                'posts_count': posts.get(author_id, 0),
+                'following_count': following.get(author_id, 0),
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_authorstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Подписок'),
+        ),
+        migrations.AddField(
+            model_name='authorstats',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
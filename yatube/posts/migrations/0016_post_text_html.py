@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:18
+
+from django.db import migrations, models
+from django.template.defaultfilters import linebreaks_filter
+from django.utils.text import Truncator
+
+from yatube.settings import POST_EXCERPT_LENGTH
+
+BATCH_SIZE = 500
+
+
+def render_texts(apps, schema_editor):
+    # Та же разметка, что в Post.render_text: иначе ленты с отложенным
+    # text догружали бы его для каждого старого поста.
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.only('text').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        for post in batch:
+            post.text_html = linebreaks_filter(post.text, autoescape=True)
+            post.excerpt = Truncator(post.text).chars(POST_EXCERPT_LENGTH)
+        Post.objects.bulk_update(batch, ['text_html', 'excerpt'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Текст поста в HTML'),
+        ),
+        migrations.RunPython(render_texts, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,12 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models import Q
+from django.template.defaultfilters import linebreaks_filter
+from django.utils.text import Truncator
+
+from yatube.settings import POST_EXCERPT_LENGTH
 
 User = get_user_model()
 
@@ -14,6 +20,38 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    """Выборки постов под конкретные страницы.
+
+    Какие связи подтягивать и какие колонки читать, решается здесь,
+    а не в каждой view.
+    """
+
+    # Все, что попадает в карточку posts/includes/post_card.html.
+    FEED_FIELDS = (
+        'id', 'pub_date', 'text_html', 'image', 'image_width',
+        'image_height', 'thumbnails', 'author', 'group',
+        'author__username', 'author__first_name', 'author__last_name',
+        'group__slug', 'group__title',
+    )
+
+    def for_feed(self):
+        """Ленты: готовая разметка вместо текста, от автора — имена."""
+        return self.select_related('author', 'group').only(
+            *self.FEED_FIELDS
+        )
+
+    def for_detail(self):
+        """Страница поста: все колонки поста с автором и группой."""
+        return self.select_related('author', 'group')
+
+    def for_admin(self):
+        """Список в админке: без разметки и миниатюр."""
+        return self.select_related('author', 'group').defer(
+            'text_html', 'excerpt', 'thumbnails'
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста'
@@ -41,12 +79,104 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True,
     )
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Ширина изображения'
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Высота изображения'
+    )
+    thumbnails = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Миниатюры'
+    )
+    text_html = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Текст поста в HTML'
+    )
+    excerpt = models.CharField(
+        max_length=POST_EXCERPT_LENGTH,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Начало текста'
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Комментариев'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Группа на момент загрузки: при смене группы сигналы сбрасывают
+        # кэш и прежней, не перечитывая ее из базы.
+        if 'group_id' in instance.__dict__:
+            instance._previous_group_id = instance.group_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.render_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'text_html', 'excerpt'
+                }
+        super().save(*args, **kwargs)
+
+    def render_text(self):
+        """Заполняет text_html и excerpt по тексту поста.
+
+        Считается один раз при записи, а не при каждом рендере ленты.
+        """
+        self.text_html = linebreaks_filter(self.text, autoescape=True)
+        self.excerpt = Truncator(self.text).chars(POST_EXCERPT_LENGTH)
+
+    def thumbnail_url(self, geometry):
+        """URL готовой миниатюры или оригинала, пока она не создана."""
+        if not self.image:
+            return ''
+        return json.loads(self.thumbnails or '{}').get(
+            geometry, self.image.url
+        )
+
+    @property
+    def is_portrait(self):
+        """Ориентация по сохраненным размерам, без чтения файла."""
+        return bool(
+            self.image_width and self.image_height
+            and self.image_height > self.image_width
+        )
+
     class Meta:
         ordering = ("-pub_date",)
+        # Ленты группы и автора идут по дате внутри группы или автора;
+        # -id нужен курсору: rowid в индексе идет по возрастанию.
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -66,6 +196,15 @@ class Comment(models.Model):
         verbose_name='Дата публикации'
     )
 
+    class Meta:
+        # Комментарии поста выводятся по времени.
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -86,6 +225,14 @@ class Follow(models.Model):
         verbose_name = 'Подписка на автора'
         verbose_name_plural = 'Подписки на авторов'
 
+        # Уникальность (user, author) дает индекс для ленты подписок,
+        # обратный нужен раскладке постов автора по подписчикам.
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
@@ -96,3 +243,66 @@ class Follow(models.Model):
                 name='author_no_user'
             ),
         ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счетчики автора."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок'
+    )
+    feed_pull = models.BooleanField(
+        default=False,
+        verbose_name='Посты подтягиваются при чтении'
+    )
+
+    class Meta:
+        verbose_name = 'Счетчики автора'
+        verbose_name_plural = 'Счетчики авторов'
+
+
+class FeedEntry(models.Model):
+    """Запись в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
@@ -0,0 +1,155 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.shortcuts import get_object_or_404
+
+from posts.hydration import hydrate_posts
+from posts.models import Group, Post
+from posts.utils import CursorPaginator, get_page
+from yatube.settings import POST_COUNT
+
+User = get_user_model()
+
+FTS_TABLE = 'posts_post_fts'
+FTS_TRIGGERS = (
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END''',
+)
+WORD_RE = re.compile(r'\w+')
+
+
+def is_supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install_triggers(using=connection):
+    """Создает триггеры синхронизации индекса с posts_post.
+
+    SQLite теряет триггеры, когда миграция пересоздает таблицу,
+    поэтому вызывается после каждого migrate.
+    """
+    if (
+        not is_supported(using)
+        or FTS_TABLE not in using.introspection.table_names()
+    ):
+        return
+    with using.cursor() as cursor:
+        for statement in FTS_TRIGGERS:
+            cursor.execute(statement)
+
+
+def rebuild(using=connection):
+    """Перестраивает индекс по текущему содержимому posts_post."""
+    with using.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def to_match(query):
+    """Переводит ввод пользователя в запрос FTS5.
+
+    Каждое слово ищется по префиксу, слова объединяются через AND,
+    а служебный синтаксис FTS5 из ввода не проходит.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(query))
+
+
+def filter_matching(queryset, query):
+    """Оставляет в queryset постов только подходящие под query."""
+    match = to_match(query)
+    if not match:
+        # В запросе нет слов, а пустой MATCH — ошибка синтаксиса FTS5.
+        return queryset.none()
+    return queryset.extra(
+        where=[
+            f'posts_post.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[match],
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорная выдача поиска по ключу (bm25, id), лучшие — первыми."""
+
+    def __init__(self, query, per_page, group=None, author=None):
+        self.match = to_match(query)
+        self.group = group
+        self.author = author
+        super().__init__(Post.objects.none(), per_page)
+
+    def get_legacy_page(self, number):
+        return self.keyset_page(None, backwards=False)
+
+    def fetch(self, anchor, backwards, limit):
+        if not self.match:
+            return []
+        sql = [
+            f'SELECT f.rowid, f.rank FROM {FTS_TABLE} f',
+            'JOIN posts_post p ON p.id = f.rowid',
+            f'WHERE {FTS_TABLE} MATCH %s',
+        ]
+        params = [self.match]
+        if self.group is not None:
+            sql.append('AND p.group_id = %s')
+            params.append(self.group.pk)
+        if self.author is not None:
+            sql.append('AND p.author_id = %s')
+            params.append(self.author.pk)
+        if anchor is not None:
+            rank, pk = anchor
+            sign = '<' if backwards else '>'
+            sql.append(
+                f'AND (f.rank {sign} %s '
+                f'OR (f.rank = %s AND f.rowid {sign} %s))'
+            )
+            params += [rank, rank, pk]
+        order = 'DESC' if backwards else 'ASC'
+        sql.append(f'ORDER BY f.rank {order}, f.rowid {order} LIMIT %s')
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(' '.join(sql), params)
+            ranked = cursor.fetchall()
+        if backwards:
+            ranked.reverse()
+        ranks = dict(ranked)
+        rows = hydrate_posts(pk for pk, _ in ranked)
+        for post in rows:
+            post.search_rank = ranks[post.pk]
+        return rows
+
+    def key(self, row):
+        return row.search_rank, row.pk
+
+    def encode_value(self, value):
+        return value
+
+    def decode_value(self, value):
+        return float(value)
+
+
+def search_page(request):
+    """Страница выдачи по ?q= с фильтрами ?group= и ?author=."""
+    group = author = None
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+    query = request.GET.get('q', '')
+    search_paginator = SearchPaginator(query, POST_COUNT, group, author)
+    return get_page(search_paginator, request), query, group, author
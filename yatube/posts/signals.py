@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posts import feeds, search
+from posts.cache import bump
+from posts.counters import change_author_stats, change_comments_count
+from posts.hydration import forget
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+def post_added(sender, instance, created, **kwargs):
+    if created:
+        change_author_stats(instance.author_id, posts_count=1)
+        feeds.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_removed(sender, instance, **kwargs):
+    change_author_stats(instance.author_id, create=False, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_added(sender, instance, created, **kwargs):
+    if created:
+        change_comments_count(instance.post_id, 1)
+    bump(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_removed(sender, instance, **kwargs):
+    change_comments_count(instance.post_id, -1)
+    bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_added(sender, instance, created, **kwargs):
+    if created:
+        change_author_stats(instance.author_id, followers_count=1)
+        change_author_stats(instance.user_id, following_count=1)
+        feeds.follow_added(instance)
+    bump(f'follow:{instance.user_id}', 'follows')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_removed(sender, instance, **kwargs):
+    change_author_stats(instance.author_id, create=False, followers_count=-1)
+    change_author_stats(instance.user_id, create=False, following_count=-1)
+    feeds.follow_removed(instance)
+    bump(f'follow:{instance.user_id}', 'follows')
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # Загруженный из базы пост уже помнит группу (Post.from_db).
+    if instance.pk is not None and not hasattr(
+        instance, '_previous_group_id'
+    ):
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    scopes = {
+        'posts',
+        f'user:{instance.author_id}',
+        f'group:{instance.group_id}',
+    }
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id is not None:
+        scopes.add(f'group:{previous_group_id}')
+    bump(*scopes)
+    forget(Post, instance.pk)
+    instance._previous_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump('groups', f'group:{instance.pk}')
+    forget(Group, instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_added(sender, instance, created, raw=False, **kwargs):
+    # Строка счетчиков с нулями: первому посту хватит одного UPDATE.
+    if created and not raw:
+        AuthorStats.objects.create(author_id=instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    forget(User, instance.pk)
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump('users', f'user:{instance.pk}')
+
+
+def install_search_triggers(sender, using, **kwargs):
+    search.install_triggers(connections[using])
@@ -0,0 +1,20 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import holes
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **args):
+    """{% hole 'follow_button' author=author.username %}
+
+    При рендере общей оболочки оставляет маркер, иначе сразу
+    рендерит дырку для текущего запроса. Аргументы должны
+    сериализоваться в JSON.
+    """
+    request = context.get('request')
+    if getattr(request, 'render_shell', False):
+        return mark_safe(holes.marker(name, args))
+    return holes.render_hole(request, name, args)
@@ -0,0 +1,50 @@
+import hashlib
+
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from yatube.settings import POST_CARD_TIMEOUT
+
+register = template.Library()
+
+CARD_KEY = 'card:{}:{}'
+
+
+def card_key(post):
+    """Ключ карточки по id и хэшу всего, что в нее попадает.
+
+    Правка поста, смена группы или имени автора дают новый ключ,
+    поэтому карточки не нужно сбрасывать отдельно.
+    """
+    author, group = post.author, post.group
+    parts = (
+        post.text_html, post.pub_date.isoformat(), post.image.name,
+        post.thumbnails, post.image_width, post.image_height,
+        author.username, author.get_full_name(),
+        group and group.slug, group and group.title,
+    )
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return CARD_KEY.format(post.pk, digest)
+
+
+@register.simple_tag
+def post_cards(posts):
+    """{% post_cards page_obj as cards %}
+
+    Готовая разметка карточек страницы: берется из кэша одним
+    get_many, рендерятся только недостающие.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {
+        key: render_to_string('posts/includes/post_card.html', {'post': post})
+        for key, post in zip(keys, posts)
+        if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, POST_CARD_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,9 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail_url(post, geometry):
+    """{{ post|thumbnail_url:"1024x1024" }} без обращения к файлу."""
+    return post.thumbnail_url(geometry)
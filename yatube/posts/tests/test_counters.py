@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(author=user)
+
+    def test_counters_follow_writes(self):
+        """ Счетчики меняются вместе с постами, комментариями и подписками """
+        post = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.create(author=self.author, text='Еще пост')
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        follow.delete()
+        post.comments.all().delete()
+        post.delete()
+        post = Post.objects.get(author=self.author)
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_first_post_updates_existing_row(self):
+        """ Строка счетчиков есть с регистрации, первый пост — один UPDATE """
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        with self.assertNumQueries(3):
+            Post.objects.create(author=self.author, text='Первый пост')
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+    def test_profile_reads_counters(self):
+        """ Профиль берет число постов из счетчика """
+        Post.objects.create(author=self.author, text='Пост')
+        AuthorStats.objects.filter(author=self.author).update(posts_count=7)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'author'}))
+        self.assertEqual(response.context['post_count'], 7)
+
+    def test_recount_fixes_drift(self):
+        """ Команда recount исправляет разошедшиеся счетчики """
+        post = Post.objects.create(author=self.author, text='Пост')
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.update(
+            posts_count=5, followers_count=5, following_count=5)
+        Post.objects.filter(pk=post.pk).update(comments_count=3)
+        call_command('recount', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.author).following_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
@@ -0,0 +1,168 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import jobs
+from core.models import Job
+from posts.feeds import follow_streams, trim_feeds
+from posts.models import FeedEntry, Follow, Post
+from posts.utils import MergedCursorPaginator
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='writer')
+        self.client_reader = Client()
+        self.client_reader.force_login(self.reader)
+
+    def feed_texts(self):
+        response = self.client_reader.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_new_post_fans_out_to_followers(self):
+        """ Новый пост попадает в ленты подписчиков """
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Свежий пост')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=post).exists())
+        self.assertEqual(self.feed_texts(), [post.text])
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """ Подписка добавляет старые посты, отписка их убирает """
+        Post.objects.create(author=self.author, text='Старый пост')
+        self.client_reader.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'writer'}))
+        self.assertEqual(self.feed_texts(), ['Старый пост'])
+        self.client_reader.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'writer'}))
+        self.assertEqual(self.feed_texts(), [])
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    def test_feed_length_is_capped(self):
+        """ Лента не длиннее FEED_LENGTH записей """
+        Follow.objects.create(user=self.reader, author=self.author)
+        with mock.patch('posts.feeds.FEED_LENGTH', 2):
+            for i in range(4):
+                Post.objects.create(author=self.author, text=f'Пост {i}')
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 2)
+
+    def test_feed_length_exact_on_ties(self):
+        """ При одинаковом времени публикации лента тоже обрезается """
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(4)
+        ]
+        FeedEntry.objects.update(pub_date=posts[0].pub_date)
+        with mock.patch('posts.feeds.FEED_LENGTH', 2):
+            trim_feeds([self.reader.pk])
+        self.assertEqual(
+            set(FeedEntry.objects.values_list('post_id', flat=True)),
+            {posts[2].pk, posts[3].pk},
+        )
+
+    def test_rebuild_feeds_command(self):
+        """ Команда rebuild_feeds восстанавливает ленты """
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Пост для ленты')
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feeds', stdout=mock.MagicMock())
+        self.assertEqual(self.feed_texts(), ['Пост для ленты'])
+
+
+@mock.patch('posts.feeds.FEED_PULL_THRESHOLD', 3)
+@mock.patch('posts.feeds.FEED_PUSH_THRESHOLD', 2)
+class HybridFeedTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='star')
+        self.quiet = User.objects.create_user(username='quiet')
+        self.fans = [
+            User.objects.create_user(username=f'fan{i}') for i in range(3)
+        ]
+        self.client_fan = Client()
+        self.client_fan.force_login(self.fans[0])
+        Follow.objects.create(user=self.fans[0], author=self.quiet)
+
+    def follow_page(self):
+        response = self.client_fan.get(reverse('posts:follow_index'))
+        return response.context['page_obj']
+
+    def test_popular_author_is_pulled(self):
+        """ Посты популярного автора читаются из pull-потока """
+        Post.objects.create(author=self.author, text='Ранний пост')
+        for fan in self.fans:
+            Follow.objects.create(user=fan, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            post__author=self.author).exists())
+        jobs.work('test', burst=True)
+        Post.objects.create(author=self.quiet, text='Тихий пост')
+        Post.objects.create(author=self.author, text='Громкий пост')
+        self.assertFalse(
+            FeedEntry.objects.filter(post__author=self.author).exists())
+        page_obj = self.follow_page()
+        self.assertEqual(
+            [post.text for post in page_obj],
+            ['Громкий пост', 'Тихий пост', 'Ранний пост'])
+        self.assertEqual(page_obj.feed_sources, {'pull': 2, 'push': 1})
+
+    def test_author_returns_to_push(self):
+        """ При потере подписчиков автор возвращается в push """
+        for fan in self.fans:
+            Follow.objects.create(user=fan, author=self.author)
+        jobs.work('test', burst=True)
+        Post.objects.create(author=self.author, text='Громкий пост')
+        Follow.objects.filter(user=self.fans[2]).delete()
+        self.assertFalse(Job.objects.filter(status=Job.QUEUED).exists())
+        Follow.objects.filter(user=self.fans[1]).delete()
+        self.assertFalse(FeedEntry.objects.filter(
+            post__author=self.author).exists())
+        jobs.work('test', burst=True)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.fans[0], post__author=self.author).exists())
+        page_obj = self.follow_page()
+        self.assertEqual(page_obj.feed_sources, {'push': 1})
+
+    def test_mode_switch_queued_once(self):
+        """ Смена режима ставится в очередь один раз и без дребезга """
+        for fan in self.fans:
+            Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.filter(user=self.fans[2]).delete()
+        Follow.objects.create(user=self.fans[2], author=self.author)
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+        jobs.work('test', burst=True)
+        Follow.objects.filter(user=self.fans[2]).delete()
+        Follow.objects.create(user=self.fans[2], author=self.author)
+        self.assertFalse(Job.objects.filter(status=Job.QUEUED).exists())
+        self.assertFalse(FeedEntry.objects.filter(
+            post__author=self.author).exists())
+
+    def test_merged_cursor_walks_both_streams(self):
+        """ Курсоры слитой ленты проходят оба потока по порядку """
+        for fan in self.fans:
+            Follow.objects.create(user=fan, author=self.author)
+        jobs.work('test', burst=True)
+        texts = []
+        for i in range(3):
+            texts.append(Post.objects.create(
+                author=self.author, text=f'Громкий {i}').text)
+            texts.append(Post.objects.create(
+                author=self.quiet, text=f'Тихий {i}').text)
+        texts.reverse()
+        streams = follow_streams(self.fans[0])
+        page = MergedCursorPaginator(streams, 4).get_page(None)
+        seen = [getattr(row, 'post', row).text for row in page]
+        page = MergedCursorPaginator(streams, 4).get_page(page.next_cursor)
+        seen += [getattr(row, 'post', row).text for row in page]
+        self.assertEqual(seen, texts)
+        self.assertIsNone(page.next_cursor)
+        page = MergedCursorPaginator(streams, 4).get_page(
+            page.previous_cursor)
+        self.assertEqual(
+            [getattr(row, 'post', row).text for row in page], texts[:4])
@@ -1,17 +1,29 @@
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from posts import thumbnails
 from posts.forms import PostForm
 from posts.models import Group, Post
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x02\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x01\x00\x02\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -113,15 +125,50 @@ class PostFormTests(TestCase):
             'text': 'Тестовый пост о разном',
             'image': uploaded
         }
-        response = self.authorized_client.post(
-            reverse('posts:post_create'),
-            data=form_data,
-            follow=True
-        )
+        with mock.patch('posts.views.thumbnails.enqueue') as enqueue:
+            response = self.authorized_client.post(
+                reverse('posts:post_create'),
+                data=form_data,
+                follow=True
+            )
         self.assertRedirects(response, reverse(
             'posts:profile',
             kwargs={'username': self.auth.username}))
         self.assertEqual(Post.objects.count(), post_count + 1)
         last_post_id = Post.objects.order_by('-id')[0]
+        enqueue.assert_called_once_with(last_post_id)
         self.assertEqual(last_post_id.group.id, form_data['group'])
         self.assertEqual(last_post_id.text, form_data['text'])
+        self.assertEqual(
+            (last_post_id.image_width, last_post_id.image_height), (2, 1))
+        self.assertFalse(last_post_id.is_portrait)
+
+    def test_backfill_image_sizes(self):
+        """ Команда заполняет размеры изображений старых постов """
+        post = Post.objects.create(
+            author=self.auth,
+            text='Пост с картинкой без размеров',
+            image=SimpleUploadedFile('tall.gif', TALL_GIF, 'image/gif'),
+        )
+        self.assertIsNone(post.image_width)
+        call_command('backfill_image_sizes', processes=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (1, 2))
+        self.assertTrue(post.is_portrait)
+
+    def test_thumbnails_generated_in_background(self):
+        """ До генерации миниатюр показывается оригинал """
+        post = Post.objects.create(
+            author=self.auth,
+            text='Пост с картинкой без миниатюр',
+            image=SimpleUploadedFile('thumb.gif', TALL_GIF, 'image/gif'),
+        )
+        self.assertEqual(post.thumbnail_url('1024x1024'), post.image.url)
+        self.assertTrue(thumbnails.generate(post.pk, post.image.name))
+        post.refresh_from_db()
+        url = post.thumbnail_url('1024x1024')
+        self.assertNotEqual(url, post.image.url)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, url)
+        self.assertFalse(thumbnails.generate(post.pk, 'posts/other.gif'))
@@ -0,0 +1,68 @@
+import pickle
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+
+from posts.heads import (FeedHead, HeadCursorPaginator, get_head,
+                         queryset_entries)
+from posts.models import Group, Post
+from posts.utils import CursorPaginator
+
+User = get_user_model()
+
+
+@mock.patch('posts.heads.FEED_HEAD_LENGTH', 7)
+class FeedHeadTests(TestCase):
+    def setUp(self):
+        caches['feeds'].clear()
+        author = User.objects.create_user(username='head-author')
+        self.group = Group.objects.create(title='Головы', slug='heads')
+        self.texts = [
+            Post.objects.create(
+                author=author, group=self.group, text=f'Пост {i}'
+            ).text
+            for i in range(12)
+        ]
+        self.texts.reverse()
+
+    def paginator(self):
+        posts = self.group.posts.all()
+        head = get_head('group:test', '1', queryset_entries(posts))
+        return HeadCursorPaginator(head, CursorPaginator(posts, 5))
+
+    def test_cursors_walk_head_and_tail(self):
+        """ Курсоры проходят голову и продолжаются за ней из базы """
+        page = self.paginator().get_page(None)
+        seen = [post.text for post in page]
+        while page.next_cursor:
+            page = self.paginator().get_page(page.next_cursor)
+            seen += [post.text for post in page]
+        self.assertEqual(seen, self.texts)
+        page = self.paginator().get_page(page.previous_cursor)
+        self.assertEqual([post.text for post in page], self.texts[5:10])
+        page = self.paginator().get_page(page.previous_cursor)
+        self.assertEqual([post.text for post in page], self.texts[:5])
+
+    def test_head_pages_skip_database(self):
+        """ Страницы внутри головы не ходят в базу """
+        first = self.paginator().get_page(None)
+        with self.assertNumQueries(0):
+            page = self.paginator().get_page(None)
+        self.assertEqual(list(page), list(first))
+        with self.assertNumQueries(1):
+            self.paginator().get_page(page.next_cursor)
+
+    def test_head_is_packed(self):
+        """ В кэше голова занимает 16 байт на запись плюс поток """
+        head = FeedHead.build(
+            queryset_entries(Post.objects.all())(1000), 1000
+        )
+        self.assertTrue(head.complete)
+        self.assertEqual(len(head), 12)
+        packed = pickle.dumps(head, pickle.HIGHEST_PROTOCOL)
+        self.assertLess(len(packed), 17 * len(head) + 150)
+        restored = pickle.loads(packed)
+        self.assertEqual(restored.keys, head.keys)
+        self.assertEqual(restored.entries(0, 2), head.entries(0, 2))
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.hydration import hydrate_posts, object_key
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class HydrationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='hydrated')
+        self.group = Group.objects.create(title='Группа', slug='hydrated')
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {i}'
+            )
+            for i in range(3)
+        ]
+        cache.clear()
+
+    def test_order_and_deleted_ids(self):
+        """ Порядок сохраняется, удаленные id пропускаются """
+        first, second, third = self.posts
+        ids = [third.pk, 10 ** 6, first.pk, second.pk]
+        with self.assertNumQueries(1):
+            posts = hydrate_posts(ids)
+        self.assertEqual(
+            [post.text for post in posts], ['Пост 2', 'Пост 0', 'Пост 1']
+        )
+        with self.assertNumQueries(1):
+            posts = hydrate_posts(ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(posts[0].author.username, 'hydrated')
+            self.assertEqual(posts[0].group.slug, 'hydrated')
+
+    def test_user_private_fields_not_cached(self):
+        """ Хэш пароля и почта автора в кэш не попадают """
+        hydrate_posts([self.posts[0].pk])
+        cached = cache.get(object_key(User, self.author.pk))
+        self.assertEqual(cached['username'], 'hydrated')
+        for name in ('password', 'email', 'is_superuser', 'last_login'):
+            self.assertNotIn(name, cached)
+
+    def test_changes_reach_cached_objects(self):
+        """ Правки поста, группы и счетчика видны сразу """
+        post = self.posts[0]
+        hydrate_posts([post.pk])
+        post.text = 'Правка'
+        post.save()
+        self.group.title = 'Новое имя'
+        self.group.save()
+        Comment.objects.create(post=post, author=self.author, text='Ответ')
+        hydrated, = hydrate_posts([post.pk])
+        self.assertEqual(hydrated.text, 'Правка')
+        self.assertEqual(hydrated.group.title, 'Новое имя')
+        self.assertEqual(hydrated.comments_count, 1)
+        self.group.delete()
+        hydrated, = hydrate_posts([post.pk])
+        self.assertIsNone(hydrated.group)
+
+    def test_post_detail_served_from_cache(self):
+        """ Пост для post_detail берется из кэша объектов """
+        post = self.posts[0]
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        hydrate_posts([post.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.context['post'].text, 'Пост 0')
+        post.delete()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,125 @@
+import json
+import random
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test import TestCase, override_settings
+
+from core.loadtest import (Recorder, WSGIDriver, percentile, regressions,
+                           summarize)
+from posts.management.commands.loadtest import browse
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class LoadTestCommandTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        # Запросы идут в WSGIHandler, а не в тестовый клиент: как и он,
+        # не даем сигналам закрыть соединение посреди транзакции теста.
+        for signal in (request_started, request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+        group = Group.objects.create(title='Нагрузка', slug='load')
+        authors = [
+            User.objects.create_user(username=f'load{i}') for i in range(3)
+        ]
+        for i in range(30):
+            Post.objects.create(
+                author=authors[i % 3], group=group, text=f'Пост {i}'
+            )
+        self.baseline = f'{TEMP_MEDIA_ROOT}/baseline.json'
+
+    def loadtest(self, *args):
+        out = StringIO()
+        call_command(
+            'loadtest', '--threads', '1', '--iterations', '12', *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_journeys_recorded_per_url_name(self):
+        """ Сценарии проходят без ошибок, эталон пишется по именам URL """
+        self.loadtest('--save-baseline', self.baseline)
+        with open(self.baseline, encoding='utf-8') as baseline_file:
+            urls = json.load(baseline_file)['urls']
+        self.assertIn('posts:index', urls)
+        self.assertTrue(all(row['errors'] == 0 for row in urls.values()))
+        self.assertTrue(all(row['p50'] <= row['p99'] for row in urls.values()))
+        self.loadtest(
+            '--journeys', 'comment,create_post', '--seed', '1',
+        )
+        self.assertTrue(Comment.objects.exists())
+        self.assertTrue(
+            Post.objects.filter(text__startswith='Нагрузочный').exists()
+        )
+
+    def test_browse_follows_cursor(self):
+        """ Сценарий browse уходит по курсору дальше первой страницы """
+        from yatube.wsgi import application
+
+        class Driver(WSGIDriver):
+            def send(self, method, path, data, files):
+                status, body = super().send(method, path, data, files)
+                pages.append((path, status, body))
+                return status, body
+
+        class Rng(random.Random):
+            def randint(self, a, b):
+                return b
+
+        pages = []
+        driver = Driver(Recorder(), application)
+        browse(driver, Rng(), {'groups': []})
+        self.assertEqual(len(pages), 3)
+        self.assertTrue(all(status == 200 for _, status, _ in pages))
+        self.assertIn('cursor=', pages[1][0])
+        self.assertNotIn('Пост 19'.encode(), pages[0][2])
+        self.assertIn('Пост 19'.encode(), pages[1][2])
+
+    def test_regression_fails_run(self):
+        """ Прогон хуже эталона завершается ошибкой """
+        with open(self.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump({'urls': {'posts:follow_index': {
+                'p95': 0.001, 'rps': 10 ** 6,
+            }}}, baseline_file)
+        with self.assertRaisesMessage(CommandError, 'posts:follow_index'):
+            self.loadtest(
+                '--journeys', 'follow_feed', '--baseline', self.baseline,
+            )
+
+
+class LoadTestSummaryTests(TestCase):
+    def test_percentiles_and_regressions(self):
+        """ Процентили по рангу, ухудшение сверх порога находится """
+        ordered = [n / 1000 for n in range(1, 101)]
+        self.assertEqual(percentile(ordered, 50), 0.05)
+        self.assertEqual(percentile(ordered, 99), 0.099)
+        recorder = Recorder()
+        for seconds in ordered:
+            recorder.add('posts:index', seconds, ok=seconds < 0.1)
+        row = summarize(recorder, 2)['posts:index']
+        self.assertEqual(
+            (row['count'], row['errors'], row['rps'], row['p95']),
+            (100, 1, 50, 95),
+        )
+        baseline = {'posts:index': {'p95': 90, 'rps': 50}}
+        self.assertEqual(regressions({'posts:index': row}, baseline, 0.1), [])
+        self.assertEqual(
+            len(regressions({'posts:index': row}, baseline, 0.01)), 1
+        )
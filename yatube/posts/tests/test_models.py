@@ -1,4 +1,8 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.template.loader import render_to_string
 from django.test import TestCase
 
 from posts.models import Group, Post
@@ -31,3 +35,42 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(post._meta.get_field(field).verbose_name,
                                  value)
+
+    def test_text_rendered_on_save(self):
+        """ HTML и начало текста считаются при сохранении """
+        post = Post.objects.create(
+            author=PostModelTest.post.author,
+            text='<b>Первый</b>\n\nВторой ' + 'абзац ' * 100,
+        )
+        self.assertTrue(post.text_html.startswith(
+            '<p>&lt;b&gt;Первый&lt;/b&gt;</p>\n\n<p>Второй'
+        ))
+        self.assertLessEqual(len(post.excerpt), 200)
+        self.assertTrue(post.excerpt.endswith('…'))
+        post.text = 'Правка'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, '<p>Правка</p>')
+        self.assertEqual(post.excerpt, 'Правка')
+
+    def test_render_post_text_command(self):
+        """ Команда заполняет разметку у старых постов """
+        Post.objects.update(text_html='', excerpt='')
+        call_command('render_post_text', chunk_size=1, stdout=StringIO())
+        post = Post.objects.get(pk=PostModelTest.post.pk)
+        self.assertEqual(
+            post.text_html, '<p>Тестовая запись для создания нового поста</p>'
+        )
+        self.assertEqual(post.excerpt, post.text)
+
+    def test_feed_projection_renders_card(self):
+        """ Карточке хватает колонок for_feed() без догрузки """
+        post = Post.objects.for_feed().get(pk=PostModelTest.post.pk)
+        self.assertTrue(
+            {'text', 'excerpt'} <= post.get_deferred_fields()
+        )
+        with self.assertNumQueries(0):
+            card = render_to_string(
+                'posts/includes/post_card.html', {'post': post}
+            )
+        self.assertIn('Тестовая запись для создания нового поста', card)
@@ -0,0 +1,102 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Полный проход по таблице: SCAN без индекса. Виртуальные таблицы
+# (полнотекстовый поиск) и константные строки сканом не считаются.
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)$')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Совпадения поиска сортируются по релевантности, индекс тут не поможет.
+RANKED = 'VIRTUAL TABLE'
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanTests(TestCase):
+    """EXPLAIN QUERY PLAN каждого запроса view: без полных сканов
+    и сортировок во временном B-дереве.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='plan-author')
+        cls.reader = User.objects.create_user(username='plan-reader')
+        cls.group = Group.objects.create(title='Планы', slug='plans')
+        for i in range(3):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост о планах {i}'
+            )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def assertIndexed(self, method, url, data=None):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        with CaptureQueriesContext(connection) as context:
+            getattr(self.client, method)(url, data)
+        problems = []
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                continue
+            plan = query_plan(sql)
+            ranked = any(RANKED in detail for detail in plan)
+            for detail in plan:
+                if FULL_SCAN.match(detail) or (
+                    TEMP_SORT in detail and not ranked
+                ):
+                    problems.append(f'{detail}: {sql}')
+        self.assertFalse(problems, '\n'.join(problems))
+
+    def test_feeds(self):
+        """ Ленты читают по индексам и без сортировки """
+        self.assertIndexed('get', reverse('posts:index'))
+        self.assertIndexed(
+            'get', reverse('posts:group_list', args=[self.group.slug])
+        )
+        self.assertIndexed(
+            'get', reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertIndexed('get', reverse('posts:follow_index'))
+
+    def test_post_pages(self):
+        """ Пост с комментариями, поиск и формы — по индексам """
+        self.assertIndexed(
+            'get', reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertIndexed('get', reverse('posts:search') + '?q=планах')
+        self.assertIndexed(
+            'post', reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Еще комментарий'},
+        )
+        self.assertIndexed(
+            'post', reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+
+    def test_follow_changes(self):
+        """ Подписка и отписка с раскладкой ленты — по индексам """
+        self.assertIndexed(
+            'get', reverse('posts:profile_unfollow', args=['plan-author'])
+        )
+        self.assertIndexed(
+            'get', reverse('posts:profile_follow', args=['plan-author'])
+        )
@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='searcher')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Коты', slug='cats', description='Про котов')
+        cls.best = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Котики котики котики и снова котики')
+        cls.good = Post.objects.create(
+            author=cls.other, text='Один котик среди длинного текста '
+            'о погоде, дорогах, книгах и прочих разных вещах')
+        Post.objects.create(author=cls.other, text='Про собак')
+
+    def found(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_prefix_search_ranked_by_bm25(self):
+        """ Поиск по префиксу, лучшие совпадения первыми """
+        self.assertEqual(self.found(q='кот'), [self.best.pk, self.good.pk])
+        self.assertEqual(self.found(q='КОТИК погод'), [self.good.pk])
+        self.assertEqual(self.found(q='"кот" OR NEAR('), [])
+
+    def test_filters(self):
+        """ Фильтры по группе и автору """
+        self.assertEqual(self.found(q='кот', group='cats'), [self.best.pk])
+        self.assertEqual(self.found(q='кот', author='other'), [self.good.pk])
+
+    def test_index_follows_edits_and_deletes(self):
+        """ Индекс следует за изменением и удалением постов """
+        post = Post.objects.create(author=self.author, text='Попугай')
+        self.assertEqual(self.found(q='попуг'), [post.pk])
+        post.text = 'Хомяк'
+        post.save()
+        self.assertEqual(self.found(q='попуг'), [])
+        self.assertEqual(self.found(q='хомяк'), [post.pk])
+        post.delete()
+        self.assertEqual(self.found(q='хомяк'), [])
+
+    def test_api_cursor_pagination(self):
+        """ Выдача API листается курсорами без повторов """
+        for i in range(12):
+            Post.objects.create(author=self.author, text=f'Енот номер {i}')
+        url = reverse('posts:search_api')
+        first = self.client.get(url, {'q': 'енот'}).json()
+        second = self.client.get(
+            url, {'q': 'енот', 'cursor': first['next']}).json()
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(len(ids), 12)
+        self.assertEqual(len(set(ids)), 12)
+        self.assertIsNone(second['next'])
+        back = self.client.get(
+            url, {'q': 'енот', 'cursor': second['previous']}).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_admin_search_uses_index(self):
+        """ Поиск в админке идет по полнотекстовому индексу """
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котик'})
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {self.best.pk, self.good.pk})
+
+    def test_admin_search_without_words(self):
+        """ Поиск в админке по одной пунктуации ничего не находит """
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': '!!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['cl'].result_list), [])
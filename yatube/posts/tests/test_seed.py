@@ -0,0 +1,76 @@
+import shutil
+import tempfile
+from collections import Counter
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.models import AuthorStats, Comment, FeedEntry, Follow, Group, Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedCommandTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, **options):
+        params = {
+            'users': '40', 'groups': '3', 'posts': '0.3k', 'follows': '80',
+            'comments': '100', 'seed': 7, 'end': '2022-04-01',
+            'batch_size': 64,
+        }
+        params.update(options)
+        args = [
+            item for name, value in params.items()
+            for item in (f'--{name.replace("_", "-")}', str(value))
+        ]
+        call_command('seed', *args, stdout=StringIO())
+
+    def snapshot(self):
+        return list(Post.objects.order_by('pk').values_list(
+            'author__username', 'group__slug', 'pub_date', 'text'
+        ))
+
+    def test_seed_is_reproducible_and_skewed(self):
+        """ Одно зерно — одни данные, популярные авторы выделяются """
+        self.seed()
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        posts_by_author = Counter(
+            Post.objects.values_list('author_id', flat=True)
+        )
+        self.assertGreater(posts_by_author.most_common(1)[0][1], 300 / 40 * 3)
+        followers = Counter(Follow.objects.values_list('author_id', flat=True))
+        self.assertGreater(followers.most_common(1)[0][1], 80 / 40 * 3)
+        self.assertEqual(
+            AuthorStats.objects.get(
+                author_id=posts_by_author.most_common(1)[0][0]
+            ).posts_count,
+            posts_by_author.most_common(1)[0][1],
+        )
+        self.assertTrue(FeedEntry.objects.exists())
+        self.assertTrue(all(
+            post.text_html for post in Post.objects.all()[:10]
+        ))
+        first = self.snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed()
+        self.assertEqual(self.snapshot(), first)
+
+    def test_fake_images(self):
+        """ Картинки создаются для заданной доли постов """
+        self.seed(posts='20', comments='0', images='0.5')
+        with_images = Post.objects.exclude(image='')
+        self.assertTrue(0 < with_images.count() < 20)
+        self.assertTrue(with_images.filter(image_width__gt=0).exists())
@@ -1,18 +1,24 @@
+import pickle
 import shutil
 import tempfile
 
 from http.client import OK
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.template.loader import render_to_string
 from django.urls import reverse
 
 from posts.models import Group, Post, Follow, Comment
-from posts.utils import POST_COUNT
+from posts.templatetags.post_cards import card_key
+from posts.utils import POST_COUNT, CursorPaginator
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -219,6 +225,51 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context.get('page_obj').object_list),
                          Post.objects.count() % POST_COUNT)
 
+    def test_cursor_navigation(self):
+        """ Переход по курсорам вперед и назад без OFFSET """
+        url = reverse('posts:group_list',
+                      kwargs={'slug': PaginatorViewsTest.group.slug})
+        first_page = self.client.get(url).context['page_obj']
+        self.assertIsNone(first_page.previous_cursor)
+        self.assertIsNotNone(first_page.next_cursor)
+        second_page = self.client.get(
+            url, {'cursor': first_page.next_cursor}).context['page_obj']
+        self.assertEqual(len(second_page), Post.objects.count() % POST_COUNT)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertFalse(
+            set(first_page.object_list) & set(second_page.object_list))
+        back_page = self.client.get(
+            url, {'cursor': second_page.previous_cursor}).context['page_obj']
+        self.assertEqual(back_page.object_list, first_page.object_list)
+        self.assertFalse(back_page.has_previous())
+
+    def test_tampered_cursor_returns_first_page(self):
+        """ Поддельный курсор открывает первую страницу """
+        url = reverse('posts:profile',
+                      kwargs={'username': self.author.username})
+        first_page = self.client.get(url).context['page_obj']
+        forged = first_page.next_cursor[:-1] + 'x'
+        page = self.client.get(url, {'cursor': forged}).context['page_obj']
+        self.assertEqual(page.object_list, first_page.object_list)
+
+    def test_legacy_page_links_to_cursor(self):
+        """ Старая ссылка ?page=N выдает курсор на соседние страницы """
+        url = reverse('posts:profile',
+                      kwargs={'username': self.author.username})
+        page = self.client.get(url, {'page': 2}).context['page_obj']
+        self.assertIsNotNone(page.previous_cursor)
+        self.assertIsNone(page.next_cursor)
+
+    def test_legacy_page_cached_without_whole_feed(self):
+        """ Старая страница кладется в кэш без выборки всей ленты """
+        page = CursorPaginator(
+            Post.objects.all(), POST_COUNT).get_legacy_page(2)
+        with self.assertNumQueries(0):
+            cached = pickle.loads(pickle.dumps(page))
+        self.assertEqual(len(cached), Post.objects.count() % POST_COUNT)
+        self.assertTrue(cached.has_previous())
+        self.assertFalse(cached.has_next())
+
 
 class CacheTests(TestCase):
     @classmethod
@@ -239,15 +290,172 @@ class CacheTests(TestCase):
     def test_cache_index(self):
         """ Тест кэша страницы index """
         first_check = self.authorized_client.get(reverse('posts:index'))
-        post_1 = Post.objects.get(pk=1)
-        post_1.text = 'Измененный текст'
-        post_1.save()
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Измененный текст', text_html='<p>Измененный текст</p>'
+        )
         second_check = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(first_check.content, second_check.content)
         cache.clear()
         third_check = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(first_check.content, third_check.content)
 
+    def test_cache_invalidated_on_save(self):
+        """ Сохранение поста сразу сбрасывает кэш ленты и группы """
+        group = Group.objects.create(title='Группа', slug='cache-group')
+        self.post.group = group
+        self.post.save()
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.post.author.username}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        self.post.text = 'Новый текст поста'
+        self.post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Новый текст поста')
+
+    def test_cache_old_group_invalidated(self):
+        """ Перенос поста в другую группу сбрасывает кэш старой группы """
+        group = Group.objects.create(title='Старая', slug='old-group')
+        self.post.group = group
+        self.post.save()
+        url = reverse('posts:group_list', kwargs={'slug': group.slug})
+        self.assertContains(self.client.get(url), self.post.text)
+        self.post.group = Group.objects.create(title='Новая', slug='new')
+        self.post.save()
+        self.assertNotContains(self.client.get(url), self.post.text)
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='anon-author')
+        self.post = Post.objects.create(
+            author=self.author, text='Пост для гостей')
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+
+    def test_repeated_request_served_from_cache(self):
+        """ Повторный запрос гостя не ходит в базу """
+        first = self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('posts:index'))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertIn('Last-Modified', second)
+
+    def test_conditional_get_returns_not_modified(self):
+        """ По ETag и Last-Modified отвечаем 304 без базы """
+        response = self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            by_etag = self.client.get(
+                self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+            by_date = self.client.get(
+                self.detail_url,
+                HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(by_etag.status_code, 304)
+        self.assertEqual(by_date.status_code, 304)
+
+    def test_comment_changes_etag(self):
+        """ Новый комментарий сбрасывает кэш страницы поста """
+        response = self.client.get(self.detail_url)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Свежий комментарий')
+        changed = self.client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, OK)
+        self.assertContains(changed, 'Свежий комментарий')
+
+    def test_page_cache_without_release(self):
+        """ Кэш страниц работает и на бэкенде без блокировки пересчета """
+        locmem = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        with override_settings(
+            CACHES=dict(settings.CACHES, template_fragments=locmem)
+        ):
+            missing = reverse('posts:post_detail', kwargs={'post_id': 0})
+            self.assertEqual(self.client.get(missing).status_code, 404)
+            self.client.get(self.detail_url)
+            with self.assertNumQueries(0):
+                response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Пост для гостей')
+
+    def test_logged_in_user_gets_no_etag(self):
+        """ Страница с сессией не отдается по ETag """
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(reverse('posts:index'))
+        self.assertNotIn('ETag', response)
+
+    def test_shell_shared_between_users(self):
+        """ Оболочка общая, а шапка и кнопки свои у каждого """
+        reader = User.objects.create_user(username='shell-reader')
+        Follow.objects.create(user=reader, author=self.author)
+        clients = {}
+        for user in (self.author, reader):
+            clients[user.username] = Client()
+            clients[user.username].force_login(user)
+        url = reverse('posts:profile', kwargs={'username': 'anon-author'})
+        author_page = clients['anon-author'].get(url)
+        with CaptureQueriesContext(connection) as queries:
+            reader_page = clients['shell-reader'].get(url)
+        self.assertFalse(
+            [q for q in queries.captured_queries if 'posts_post' in q['sql']])
+        self.assertContains(author_page, 'Пользователь: anon-author')
+        self.assertNotContains(author_page, 'Отписаться')
+        self.assertContains(reader_page, 'Пользователь: shell-reader')
+        self.assertContains(reader_page, 'Отписаться')
+        self.assertContains(reader_page, 'Пост для гостей')
+        self.assertNotContains(reader_page, '<!--hole:')
+
+    def test_comment_form_filled_per_user(self):
+        """ Форму комментария и кнопку правки видят только свои """
+        client = Client()
+        client.force_login(self.author)
+        self.client.get(self.detail_url)
+        response = client.get(self.detail_url)
+        self.assertContains(response, 'Редактировать')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(self.client.get(self.detail_url), 'Добавить')
+
+
+class PostCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='card-author')
+        self.group = Group.objects.create(title='Карточки', slug='cards')
+        for i in range(3):
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Карточка {i}')
+
+    def test_cards_shared_between_pages(self):
+        """ Карточки, отрендеренные для главной, берутся и для группы """
+        render = 'posts.templatetags.post_cards.render_to_string'
+        with mock.patch(render, wraps=render_to_string) as rendered:
+            self.client.get(reverse('posts:index'))
+            self.assertEqual(rendered.call_count, 3)
+            response = self.client.get(
+                reverse('posts:group_list', kwargs={'slug': 'cards'}))
+            self.assertEqual(rendered.call_count, 3)
+            Post.objects.create(author=self.author, text='Новая карточка')
+            self.client.get(reverse('posts:index'))
+            self.assertEqual(rendered.call_count, 4)
+        self.assertContains(response, 'Карточка 2')
+
+    def test_card_changes_with_group(self):
+        """ Смена названия группы дает новую карточку """
+        post = Post.objects.first()
+        key = card_key(post)
+        self.group.title = 'Переименованная'
+        self.group.save()
+        self.assertNotEqual(card_key(Post.objects.get(pk=post.pk)), key)
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Переименованная')
+
 
 class FollowTests(TestCase):
     def setUp(self):
@@ -0,0 +1,43 @@
+import json
+
+from sorl.thumbnail import get_thumbnail
+
+from core.jobs import task
+from posts.cache import bump
+from posts.hydration import forget
+from posts.models import Post
+from yatube.settings import THUMBNAIL_GEOMETRIES
+
+
+def enqueue(post):
+    """Ставит создание миниатюр поста в очередь задач.
+
+    До готовности шаблоны показывают оригинал изображения.
+    """
+    if post.image:
+        generate.delay(post.pk, post.image.name, priority=1)
+
+
+@task
+def generate(pk, name):
+    """Создает миниатюры всех геометрий и сохраняет их URL в пост.
+
+    Если пост удалили или картинку успели заменить, ничего не делает.
+    """
+    post = Post.objects.filter(pk=pk, image=name).only(
+        'pk', 'image', 'author_id', 'group_id'
+    ).first()
+    if post is None:
+        return False
+    urls = {
+        geometry: get_thumbnail(post.image, geometry, **options).url
+        for geometry, options in THUMBNAIL_GEOMETRIES.items()
+    }
+    updated = Post.objects.filter(pk=pk, image=name).update(
+        thumbnails=json.dumps(urls)
+    )
+    if updated:
+        # update() не шлет сигналов, фрагменты лент сбрасываем сами.
+        bump('posts', f'user:{post.author_id}', f'group:{post.group_id}')
+        forget(Post, pk)
+    return bool(updated)
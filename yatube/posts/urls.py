@@ -1,30 +1,63 @@
 from django.urls import path
 
+from core.queries import budget
 from . import views
 
 app_name = 'posts'
 
+# Бюджеты считаются на холодный кэш: queries — запросов за обработку,
+# time — миллисекунд в базе.
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('group/<slug:slug>/', views.group_posts, name='group_list'),
-    path('profile/<str:username>/', views.profile, name='profile'),
-    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
-    path('create/', views.post_create, name='post_create'),
-    path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
-    path('follow/', views.follow_index, name='follow_index'),
+    path('', budget(views.index, queries=6, time=50), name='index'),
+    path(
+        'group/<slug:slug>/',
+        budget(views.group_posts, queries=8, time=50),
+        name='group_list'
+    ),
+    path(
+        'profile/<str:username>/',
+        budget(views.profile, queries=12, time=50),
+        name='profile'
+    ),
+    path(
+        'posts/<int:post_id>/',
+        budget(views.post_detail, queries=8, time=50),
+        name='post_detail'
+    ),
+    path(
+        'create/',
+        budget(views.post_create, queries=12, time=100),
+        name='post_create'
+    ),
+    path(
+        'posts/<int:post_id>/edit/',
+        budget(views.post_edit, queries=9, time=100),
+        name='post_edit'
+    ),
+    path(
+        'follow/',
+        budget(views.follow_index, queries=8, time=50),
+        name='follow_index'
+    ),
+    path('search/', budget(views.search, queries=5, time=50), name='search'),
+    path(
+        'search/api/',
+        budget(views.search_api, queries=4, time=50),
+        name='search_api'
+    ),
     path(
         'posts/<int:post_id>/comment/',
-        views.add_comment,
+        budget(views.add_comment, queries=8, time=100),
         name='add_comment'
     ),
     path(
         'profile/<str:username>/follow/',
-        views.profile_follow,
+        budget(views.profile_follow, queries=22, time=100),
         name='profile_follow'
     ),
     path(
         'profile/<str:username>/unfollow/',
-        views.profile_unfollow,
+        budget(views.profile_unfollow, queries=16, time=100),
         name='profile_unfollow'
     ),
 ]
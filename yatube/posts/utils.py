@@ -1,11 +1,219 @@
-from django.core.paginator import Paginator
+import heapq
 
-from yatube.settings import POST_COUNT
+from django.core import signing
+from django.core.paginator import Page, Paginator
+from django.utils.dateparse import parse_datetime
 
+from core.tiered import cached
+from yatube.settings import PAGE_CACHE_TIMEOUT, POST_COUNT
 
-def paginator(post_list, request):
-    paginator = Paginator(post_list, POST_COUNT)
+CURSOR_SALT = 'posts.cursor'
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    Каждая страница выбирается условием по индексу pub_date, поэтому
+    время ответа не зависит от глубины страницы. Позиция передается
+    в подписанном токене ?cursor=. Номера страниц относительные:
+    у первой страницы номер 1, у остальных 2, а num_pages известен
+    только на одну страницу вперед.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id')):
+        self.keys = keys
+        super().__init__(
+            object_list.order_by(*(f'-{key}' for key in keys)), per_page
+        )
+        self._number = 1
+        self._has_next = False
+
+    @property
+    def num_pages(self):
+        return self._number + int(self._has_next)
+
+    def __getstate__(self):
+        # В кэш попадает уже выбранная страница; queryset ей не нужен,
+        # а при pickle он выполнился бы целиком.
+        state = self.__dict__.copy()
+        state['object_list'] = None
+        return state
+
+    def get_page(self, cursor):
+        """Возвращает страницу по токену, первую — если токена нет
+        или он поврежден.
+        """
+        try:
+            value, pk, backwards = signing.loads(cursor, salt=CURSOR_SALT)
+            anchor = (self.decode_value(value), pk)
+        except (TypeError, ValueError, signing.BadSignature):
+            return self.keyset_page(None, backwards=False)
+        return self.keyset_page(anchor, backwards=bool(backwards))
+
+    def get_legacy_page(self, number):
+        """Страница по старой ссылке ?page=N через OFFSET.
+
+        Дальше по ленте пользователь переходит уже по курсорам.
+        """
+        page = Paginator(self.object_list, self.per_page).get_page(number)
+        rows = list(page)
+        # Страница остается за этим пагинатором: простой Paginator
+        # держит queryset всей ленты, и pickle выполнил бы его в кэш.
+        self._number = page.number
+        self._has_next = page.has_next()
+        page.object_list = rows
+        page.paginator = self
+        page.previous_cursor = (
+            self.cursor(rows[0], backwards=True)
+            if rows and page.has_previous() else None
+        )
+        page.next_cursor = (
+            self.cursor(rows[-1]) if rows and page.has_next() else None
+        )
+        return page
+
+    def keyset_page(self, anchor, backwards):
+        rows = self.fetch(anchor, backwards, self.per_page + 1)
+        if anchor is not None and not rows:
+            return self.keyset_page(None, backwards=False)
+        has_more = len(rows) > self.per_page
+        if backwards:
+            rows = rows[-self.per_page:]
+            has_previous, has_next = has_more, True
+        else:
+            rows = rows[:self.per_page]
+            has_previous, has_next = anchor is not None, has_more
+        self._number = 2 if has_previous else 1
+        self._has_next = has_next
+        page = Page(rows, self._number, self)
+        page.previous_cursor = (
+            self.cursor(rows[0], backwards=True) if has_previous else None
+        )
+        page.next_cursor = self.cursor(rows[-1]) if has_next else None
+        return page
+
+    def fetch(self, anchor, backwards, limit):
+        """Выбирает limit строк после anchor (или до него при backwards)
+        в порядке от новых к старым.
+        """
+        queryset = self.object_list
+        if anchor is not None:
+            first, second = self.keys
+            value, pk = anchor
+            if backwards:
+                queryset = queryset.filter(
+                    **{f'{first}__gte': value}
+                ).exclude(
+                    **{first: value, f'{second}__lte': pk}
+                ).reverse()
+            else:
+                queryset = queryset.filter(
+                    **{f'{first}__lte': value}
+                ).exclude(
+                    **{first: value, f'{second}__gte': pk}
+                )
+        rows = list(queryset[:limit])
+        if backwards and anchor is not None:
+            rows.reverse()
+        return rows
+
+    def key(self, row):
+        return tuple(getattr(row, key) for key in self.keys)
+
+    def cursor(self, row, backwards=False):
+        value, pk = self.key(row)
+        return signing.dumps(
+            [self.encode_value(value), pk, int(backwards)],
+            salt=CURSOR_SALT,
+            compress=True,
+        )
+
+    def encode_value(self, value):
+        return value.isoformat()
+
+    def decode_value(self, value):
+        decoded = parse_datetime(value)
+        if decoded is None:
+            raise ValueError('Invalid cursor value')
+        return decoded
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Сливает по ключу (pub_date, id) несколько потоков.
+
+    streams — словарь {имя: (queryset, keys)}. Из каждого потока
+    выбирается не больше страницы строк, у строки остается атрибут
+    feed_source с именем потока.
+    """
+
+    def __init__(self, streams, per_page):
+        self.streams = {
+            name: CursorPaginator(queryset, per_page, keys)
+            for name, (queryset, keys) in streams.items()
+        }
+        Paginator.__init__(self, [], per_page)
+        self._number = 1
+        self._has_next = False
+
+    def get_legacy_page(self, number):
+        """Старая ссылка ?page=N: пропускаем N-1 страниц слияния."""
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        offset = (number - 1) * self.per_page
+        rows = self.fetch(None, False, offset + self.per_page + 1)
+        if offset and len(rows) <= offset:
+            return self.keyset_page(None, backwards=False)
+        has_next = len(rows) > offset + self.per_page
+        rows = rows[offset:offset + self.per_page]
+        self._number = 2 if offset else 1
+        self._has_next = has_next
+        page = Page(rows, self._number, self)
+        page.previous_cursor = (
+            self.cursor(rows[0], backwards=True) if offset else None
+        )
+        page.next_cursor = self.cursor(rows[-1]) if has_next else None
+        return page
+
+    def fetch(self, anchor, backwards, limit):
+        fetched = []
+        for name, stream in self.streams.items():
+            rows = stream.fetch(anchor, backwards, limit)
+            for row in rows:
+                row.feed_source = name
+                row.feed_key = stream.key(row)
+            fetched.append(rows)
+        rows = list(heapq.merge(*fetched, key=self.key, reverse=True))
+        if backwards:
+            return rows[-limit:]
+        return rows[:limit]
+
+    def key(self, row):
+        return row.feed_key
+
+
+def get_page(cursor_paginator, request):
+    """Страница по ?cursor=, а для старых ссылок — по ?page=N."""
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if page_number is not None and 'cursor' not in request.GET:
+        return cursor_paginator.get_legacy_page(page_number)
+    return cursor_paginator.get_page(request.GET.get('cursor'))
+
+
+def page_key(post_list, request, version=None):
+    """Ключ страницы ленты: без версии данных страница не кэшируется."""
+    if version is None:
+        return None
+    return ':'.join((
+        'page', request.path, request.GET.get('cursor', ''),
+        request.GET.get('page', ''), version,
+    ))
+
+
+@cached(PAGE_CACHE_TIMEOUT, page_key)
+def paginator(post_list, request, version=None):
+    cursor_paginator = CursorPaginator(post_list, POST_COUNT)
+    page_obj = get_page(cursor_paginator, request)
 
     return page_obj
@@ -1,61 +1,81 @@
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
-from posts.utils import paginator
+from core.sqlite.transaction import atomic_write
+from posts import thumbnails
+from posts.cache import cache_page, generation
+from posts.counters import get_stats
+from posts.feeds import follow_page
+from posts.heads import HeadCursorPaginator, get_head, queryset_entries
+from posts.hydration import get_post_or_404
+from posts.search import search_page
+from posts.utils import CursorPaginator, get_page, paginator
 from posts.forms import PostForm, CommentForm
 from posts.models import Group, Post, Follow
+from yatube.settings import POST_COUNT
 
 User = get_user_model()
 
 
+@cache_page('posts', 'users', 'groups')
 def index(request):
-    post_list = Post.objects.select_related('author', 'group')
-    page_obj = paginator(post_list, request)
+    post_list = Post.objects.for_feed()
+    version = generation('posts', 'users', 'groups')
+    page_obj = paginator(post_list, request, version)
     context = {
         'page_obj': page_obj,
+        'generation': version,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_page('posts', 'users', 'groups')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = paginator(posts, request)
+    posts = group.posts.for_feed()
+    version = generation(f'group:{group.pk}', 'users')
+    head = get_head(f'group:{group.pk}', version, queryset_entries(posts))
+    page_obj = get_page(
+        HeadCursorPaginator(head, CursorPaginator(posts, POST_COUNT)),
+        request,
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
+        'generation': version,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_page('posts', 'users', 'groups', 'follows')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_count = author.posts.all().count()
-    author_post = author.posts.all()
-    page_obj = paginator(author_post, request)
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author
-        ).exists()
-    else:
-        following = False
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = get_stats(author)
+    author_post = author.posts.for_feed()
+    version = generation(f'user:{author.pk}', 'groups')
+    page_obj = paginator(author_post, request, version)
     profile = author
     context = {
         'page_obj': page_obj,
-        'post_count': post_count,
+        'post_count': stats.posts_count,
+        'stats': stats,
         'author': author,
-        'following': following,
-        'profile': profile
+        'profile': profile,
+        'generation': version,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@cache_page('posts', 'users', 'groups', 'post:{post_id}')
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    post_count = post.author.posts.all().count()
-    comments = post.comments.select_related('author')
+    post = get_post_or_404(post_id)
+    post_count = get_stats(post.author).posts_count
+    comments = post.comments.select_related('author').order_by('created')
     context = {
         'post': post,
         'comments': comments,
@@ -65,6 +85,19 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def save_post(post, image_changed=True):
+    """Сохраняет пост из формы; очередь записи занята только на запись.
+
+    Загруженная картинка пишется в хранилище до транзакции.
+    """
+    if post.image and not post.image._committed:
+        post.image.save(post.image.name, post.image.file, save=False)
+    with atomic_write():
+        post.save()
+        if image_changed:
+            thumbnails.enqueue(post)
+
+
 @login_required
 def post_create(request):
     if request.method == 'POST':
@@ -75,7 +108,7 @@ def post_create(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            save_post(post)
             return redirect('posts:profile', request.user)
         return render(request, 'posts/create_post.html', {'form': form})
     form = PostForm()
@@ -85,7 +118,7 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.pk:
         return redirect('posts:post_detail', post.pk)
 
     form = PostForm(
@@ -94,7 +127,7 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        post.save()
+        save_post(post, image_changed='image' in form.changed_data)
         return redirect('posts:post_detail', post.pk)
     form = PostForm(instance=post)
     context = {
@@ -112,16 +145,19 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with atomic_write():
+            comment.save()
     return redirect('posts:post_detail', post.pk)
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(post_list, request)
+    version = generation(
+        f'follow:{request.user.pk}', 'posts', 'users', 'groups'
+    )
     context = {
-        'page_obj': page_obj,
+        'page_obj': follow_page(request, version),
+        'generation': version,
     }
     return render(request, 'posts/follow.html', context)
 
@@ -131,8 +167,11 @@ def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
     is_follower = Follow.objects.filter(user=user, author=author)
-    if user != author and not is_follower.exists():
-        Follow.objects.create(user=user, author=author)
+    if user != author:
+        with atomic_write():
+            # Проверка в той же транзакции: два клика не дадут дубль.
+            if not is_follower.exists():
+                Follow.objects.create(user=user, author=author)
     return redirect(reverse('posts:profile', args=[username]))
 
 
@@ -141,5 +180,36 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     is_follower = Follow.objects.filter(user=request.user, author=author)
     if is_follower.exists():
-        is_follower.delete()
+        with atomic_write():
+            is_follower.delete()
     return redirect('posts:profile', username=author)
+
+
+def search(request):
+    page_obj, query, group, author = search_page(request)
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'group': group,
+        'author': author,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def search_api(request):
+    page_obj, *_ = search_page(request)
+    return JsonResponse({
+        'results': [
+            {
+                'id': post.pk,
+                'text': post.text,
+                'author': post.author.username,
+                'group': post.group.slug if post.group else None,
+                'pub_date': post.pub_date.isoformat(),
+                'rank': post.search_rank,
+            }
+            for post in page_obj
+        ],
+        'next': page_obj.next_cursor,
+        'previous': page_obj.previous_cursor,
+    })
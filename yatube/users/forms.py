@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
+
+from .tasks import send_password_reset
 
 User = get_user_model()
 
@@ -8,3 +10,23 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Письмо со ссылкой сброса уходит через очередь задач."""
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        # Ссылка со сбросом пароля открывает аккаунт, и в строке
+        # задачи ее быть не должно: токен сделает обработчик.
+        send_password_reset.delay(
+            context['user'].pk,
+            {
+                name: value for name, value in context.items()
+                if name not in ('email', 'user', 'uid', 'token')
+            },
+            subject_template_name, email_template_name, from_email,
+            html_email_template_name,
+            priority=2,
+        )
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives
+from django.template import loader
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core.jobs import task
+
+User = get_user_model()
+
+
+@task
+def send_email(subject, body, from_email, recipients, html=None):
+    message = EmailMultiAlternatives(subject, body, from_email, recipients)
+    if html is not None:
+        message.attach_alternative(html, 'text/html')
+    message.send()
+
+
+@task
+def send_password_reset(user_pk, context, subject_template_name,
+                        email_template_name, from_email,
+                        html_email_template_name=None):
+    """Письмо сброса пароля: токен делается только здесь.
+
+    В очереди лежат id пользователя и адрес сайта, а ссылку,
+    по которой можно сменить пароль, задача никуда не сохраняет.
+    """
+    user = User.objects.filter(pk=user_pk, is_active=True).first()
+    if user is None:
+        return
+    context = dict(
+        context,
+        email=user.email,
+        user=user,
+        uid=urlsafe_base64_encode(force_bytes(user.pk)),
+        token=default_token_generator.make_token(user),
+    )
+    subject = loader.render_to_string(subject_template_name, context)
+    body = loader.render_to_string(email_template_name, context)
+    html = None
+    if html_email_template_name is not None:
+        html = loader.render_to_string(html_email_template_name, context)
+    send_email(
+        ''.join(subject.splitlines()), body, from_email, [user.email], html
+    )
@@ -34,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.queries.QueryBudgetMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,10 +73,46 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
+# Прагмы каждого соединения с базой (core.sqlite). WAL пускает чтение
+# параллельно записи, busy_timeout — мс ожидания чужой записи.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — в КиБ: 64 МБ страниц на соединение.
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+# Сколько секунд поток ждет очередь записи своего процесса.
+SQLITE_WRITE_GATE_TIMEOUT = 10
+
+# Реплики только для чтения (core.routers). Локально это копии
+# db.sqlite3, которые обновляет manage.py sync_replicas.
+REPLICA_COUNT = 0
+DATABASE_REPLICAS = tuple(
+    f'replica{number}' for number in range(1, REPLICA_COUNT + 1)
+)
+for _alias in DATABASE_REPLICAS:
+    DATABASES[_alias] = {
+        'ENGINE': 'core.sqlite',
+        'NAME': os.path.join(BASE_DIR, f'db.{_alias}.sqlite3'),
+        # В тестах реплика — та же тестовая база.
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Реплика, отставшая больше чем на столько секунд, не читается.
+REPLICA_MAX_LAG = 30
+# Сколько секунд после записи пользователь читает только реплики,
+# скопированные позже нее. Дольше не нужно: более старые реплики
+# и так отсекает REPLICA_MAX_LAG.
+REPLICA_STICKY_SECONDS = REPLICA_MAX_LAG
+# Как часто процесс перечитывает отставание реплик, в секундах.
+REPLICA_LAG_CHECK = 5
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -112,12 +150,71 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 POST_COUNT = 10
-
+POST_EXCERPT_LENGTH = 200
+FEED_LENGTH = 1000
+FEED_PULL_THRESHOLD = 1000
+# Pull-автор возвращается в push, только когда подписчиков меньше этого:
+# зазор не дает автору на границе переключаться на каждой подписке.
+FEED_PUSH_THRESHOLD = 800
+# Миниатюры, которые используют шаблоны: геометрия -> опции sorl.
+THUMBNAIL_GEOMETRIES = {
+    '1024x1024': {'upscale': True},
+}
+# Очередь фоновых задач core.jobs, интервалы в секундах.
+JOB_POLL_INTERVAL = 1
+JOB_RETRY_DELAY = 10
+JOB_TIMEOUT = 600
+JOB_KEEP_DONE = 7 * 24 * 60 * 60
+
+# Общий для всех процессов кэш: фрагменты и счетчики поколений
+# видны каждому воркеру, а не только тому, кто их записал.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+            'MAX_BYTES': 256 * 1024 * 1024,
+            'POLICY': 'lru',
+        },
+    },
+    # Головы лент из posts.heads: MAX_BYTES — бюджет на все ленты.
+    'feeds': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'feeds.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_BYTES': 64 * 1024 * 1024,
+            'POLICY': 'lru',
+        },
+    },
+    # {% cache %} и core.tiered.cached: память процесса перед общим кэшем
+    # с защитой от одновременного пересчета одного фрагмента.
+    'template_fragments': {
+        'BACKEND': 'core.tiered.TieredCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {
+            'L2': 'default',
+            'L1_ENTRIES': 1000,
+            'L1_TIMEOUT': 10,
+            'STALE_TIMEOUT': 60,
+            'LOCK_TIMEOUT': 10,
+            'WAIT_TIMEOUT': 1,
+        },
+    },
 }
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+POST_CARD_TIMEOUT = 60 * 60 * 24
+HYDRATION_TIMEOUT = 60 * 60 * 24
+# Записей в голове ленты, по 16 байт и байту на поток каждая.
+FEED_HEAD_LENGTH = 300
+FEED_HEAD_TIMEOUT = 60 * 60 * 6
+
+# Бюджеты запросов view (core.queries): в тестах превышение — ошибка.
+QUERY_BUDGET_STRICT = False
+TEST_RUNNER = 'core.testing.QueryBudgetRunner'
+QUERY_DUPLICATE_THRESHOLD = 5
+QUERY_STATS_FLUSH = 10
 
 INTERNAL_IPS = [
     '127.0.0.1',